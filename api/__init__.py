@@ -1,5 +1,5 @@
 #import logging
-from flask import Flask, g
+from flask import Flask, g, request
 from flask_restful import Api, Resource, reqparse, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -7,12 +7,18 @@ from config import Config
 from flask_marshmallow import Marshmallow
 from flask_httpauth import HTTPBasicAuth
 from flask_apispec.extension import FlaskApiSpec
+from werkzeug.middleware.proxy_fix import ProxyFix
+from api.security import credential_cache, token_states, password_hasher, login_failures
+from api.encoding import output_json, json_response
 
 """
 Основной файл проекта
 """
 app = Flask(__name__)
 app.config.from_object(Config)
+if Config.PROXY_FIX_X_FOR:
+    # За обратным прокси request.remote_addr - адрес клиента, а не прокси
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_X_FOR)
 
 # logging.basicConfig(filename='record.log',
 #                    level=logging.INFO,
@@ -23,6 +29,8 @@ app.config.from_object(Config)
 # logging.getLogger('werkzeug').setLevel(logging.INFO)
 
 api = Api(app)
+api.representation('application/json')(output_json)
+app.config.setdefault('APISPEC_FORMAT_RESPONSE', json_response)
 db = SQLAlchemy(app)
 migrate = Migrate(app, db, render_as_batch=True)
 ma = Marshmallow(app)
@@ -33,16 +41,31 @@ docs = FlaskApiSpec(app)
 @auth.verify_password
 def verify_password(username_or_token, password):
     """
-    Валидация пароля, при успешной валидации помещает объект пользователя в глобальное хранилище flask
+    Валидация пароля, при успешной валидации помещает объект пользователя в глобальное хранилище flask.
+    Успешные проверки пароля запоминаются в кэше, чтобы не вычислять хэш на каждый запрос.
+    Повторные неудачные попытки с того же адреса отклоняются без обращения к БД.
+    Способ аутентификации (по паролю или по токену) сохраняется в g.password_login
     :param username_or_token: токен
     :param password: пароль
     :return: bool
     """
     from api.models.user import UserModel
+    if not username_or_token:
+        return False
     user = UserModel.verify_auth_token(username_or_token)
+    g.password_login = not user
     if not user:
-        user = UserModel.query.filter_by(username=username_or_token).first()
-        if not user or not user.verify_password(password):
+        if login_failures.is_blocked(username_or_token, request.remote_addr):
             return False
+        user = UserModel.principal_query().filter_by(username=username_or_token).first()
+        if not user:
+            login_failures.record(username_or_token, request.remote_addr)
+            return False
+        if not credential_cache.check(user.username, password, user.password_hash):
+            if not user.verify_password(password):
+                login_failures.record(username_or_token, request.remote_addr)
+                return False
+            credential_cache.put(user.username, password, user.password_hash)
+        login_failures.reset(username_or_token, request.remote_addr)
     g.user = user
     return True
@@ -0,0 +1,247 @@
+import os
+import tempfile
+import time
+import click
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from api import app, db
+
+"""
+Команды flask для замеров производительности.
+Все замеры выполняются на временной БД в памяти, рабочая БД не затрагивается
+"""
+
+
+@contextmanager
+def temporary_db(in_memory=True):
+    """
+    Переключает приложение на пустую временную БД на время замера
+    :param in_memory: БД в памяти; для многопоточных замеров используется временный файл
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    fd, path = (None, None) if in_memory else tempfile.mkstemp(suffix='.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://' if in_memory else 'sqlite:///' + path
+    db.create_all()
+    try:
+        yield db
+    finally:
+        db.session.remove()
+        db.drop_all()
+        app.config['SQLALCHEMY_DATABASE_URI'] = uri
+        if path:
+            os.close(fd)
+            os.remove(path)
+
+
+def measure(func, repeat):
+    """
+    Выполняет функцию несколько раз
+    :param func: замеряемая функция
+    :param repeat: количество повторов
+    :return: среднее время одного вызова, мс
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+@app.cli.command('bench-auth')
+@click.option('--notes', default='0,100,1000,5000', help='Количество заметок пользователя, через запятую')
+@click.option('--repeat', default=200, help='Количество повторов загрузки пользователя')
+def bench_auth(notes, repeat):
+    """
+    Сравнивает загрузку пользователя при аутентификации: полный граф UserModel и только учетные данные
+    """
+    from api.models.user import UserModel
+    from api.models.note import NoteModel
+    from api.models.tag import TagModel
+
+    def fetched_rows(query):
+        return len(db.session.execute(query.filter_by(username='bench').statement).fetchall())
+
+    def load_full():
+        db.session.remove()
+        UserModel.query.filter_by(username='bench').first()
+
+    def load_principal():
+        db.session.remove()
+        UserModel.principal_query().filter_by(username='bench').first()
+
+    click.echo(f"{'notes':>8} {'full, ms':>10} {'rows':>8} {'principal, ms':>14} {'rows':>6}")
+    for notes_count in [int(count) for count in notes.split(',')]:
+        with temporary_db():
+            user = UserModel(username='bench', password='bench')
+            user.save()
+            db.session.add_all(NoteModel(author_id=user.id, note=f'note {i}') for i in range(notes_count))
+            db.session.add_all(TagModel(author_id=user.id, name=f'tag {i}') for i in range(10))
+            db.session.commit()
+            full_rows = fetched_rows(UserModel.query)
+            principal_rows = fetched_rows(UserModel.principal_query())
+            full = measure(load_full, repeat)
+            principal = measure(load_principal, repeat)
+            click.echo(f"{notes_count:>8} {full:>10.3f} {full_rows:>8} {principal:>14.3f} {principal_rows:>6}")
+
+
+@app.cli.command('bench-hash')
+@click.option('--schemes', default='sha512_crypt,sha256_crypt,pbkdf2_sha256,bcrypt,argon2',
+              help='Схемы хэширования, через запятую')
+@click.option('--rounds', default=None, type=int, help='Количество раундов, по умолчанию - значение passlib')
+@click.option('--repeat', default=5, help='Количество повторов хэширования и проверки')
+def bench_hash(schemes, rounds, repeat):
+    """
+    Замеряет время хэширования и проверки пароля для схем passlib
+    """
+    from passlib.exc import MissingBackendError
+    from config import Config, password_context
+
+    click.echo(f"Текущие настройки: {Config.PASSWORD_HASH_SCHEME}, раунды: {Config.PASSWORD_HASH_ROUNDS or 'default'}")
+    click.echo(f"{'scheme':>15} {'rounds':>10} {'hash, ms':>10} {'verify, ms':>11}")
+    for scheme in schemes.split(','):
+        try:
+            context = password_context(scheme, rounds)
+            password_hash = context.hash('benchmark password')
+        except (MissingBackendError, KeyError, ValueError) as e:
+            click.echo(f"{scheme:>15} пропущена: {e}")
+            continue
+        scheme_rounds = getattr(context.handler(scheme).from_string(password_hash), 'rounds', '-')
+        hash_time = measure(lambda: context.hash('benchmark password'), repeat)
+        verify_time = measure(lambda: context.verify('benchmark password', password_hash), repeat)
+        click.echo(f"{scheme:>15} {scheme_rounds:>10} {hash_time:>10.1f} {verify_time:>11.1f}")
+
+
+@app.cli.command('bench-pool')
+@click.option('--threads', default=8, help='Количество одновременных клиентов')
+@click.option('--requests', default=200, help='Количество запросов')
+@click.option('--login-every', default=5, help='Каждый n-й запрос - вход по паролю, остальные - чтение по токену')
+@click.option('--pool-size', default=os.cpu_count(), help='Размер пула процессов для хэширования')
+def bench_pool(threads, requests, login_every, pool_size):
+    """
+    Сравнивает пропускную способность при смешанной нагрузке (вход по паролю и чтение заметок)
+    с хэшированием паролей в потоке запроса и в пуле процессов
+    """
+    from api.security import credential_cache, password_hasher
+    from api.models.user import UserModel
+    from api.models.note import NoteModel
+
+    with temporary_db(in_memory=False):
+        user = UserModel(username='bench', password='bench')
+        user.save()
+        db.session.add_all(NoteModel(author_id=user.id, note=f'note {i}') for i in range(50))
+        db.session.commit()
+        basic_headers = {'Authorization': 'Basic ' + b64encode(b'bench:bench').decode('utf-8')}
+        token = app.test_client().get('/auth/token', headers=basic_headers).get_json()['token']
+        token_headers = {'Authorization': 'Basic ' + b64encode(f'{token}:'.encode('ascii')).decode('utf-8')}
+
+        def call(i):
+            client = app.test_client()
+            start = time.perf_counter()
+            if i % login_every == 0:
+                status = client.get('/auth/token', headers=basic_headers).status_code
+            else:
+                status = client.get('/notes', headers=token_headers).status_code
+            return i % login_every == 0, status, time.perf_counter() - start
+
+        cache_size = credential_cache.max_size
+        credential_cache.max_size = 0  # каждый вход по паролю вычисляет хэш
+        credential_cache.clear()
+        click.echo(f"{'pool':>6} {'req/s':>8} {'login avg, ms':>14} {'read avg, ms':>13} {'errors':>7}")
+        try:
+            for size in (0, pool_size):
+                password_hasher.set_pool_size(size)
+                if size:
+                    list(ThreadPoolExecutor(size).map(password_hasher.hash, ['warm up'] * size))
+                start = time.perf_counter()
+                with ThreadPoolExecutor(threads) as executor:
+                    results = list(executor.map(call, range(requests)))
+                elapsed = time.perf_counter() - start
+                logins = [duration for is_login, _, duration in results if is_login]
+                reads = [duration for is_login, _, duration in results if not is_login]
+                errors = sum(1 for _, status, _ in results if status != 200)
+                click.echo(f"{size:>6} {requests / elapsed:>8.1f} {sum(logins) / len(logins) * 1000:>14.1f} "
+                           f"{sum(reads) / len(reads) * 1000:>13.1f} {errors:>7}")
+        finally:
+            credential_cache.max_size = cache_size
+            password_hasher.set_pool_size(app.config['PASSWORD_HASH_POOL_SIZE'])
+
+
+@app.cli.command('bench-serialize')
+@click.option('--notes', default='100,1000,5000', help='Количество заметок, через запятую')
+@click.option('--tags', default=3, help='Количество тегов у каждой заметки')
+@click.option('--repeat', default=20, help='Количество повторов сериализации')
+def bench_serialize(notes, tags, repeat):
+    """
+    Сравнивает сериализацию списка заметок схемой marshmallow и быстрыми функциями api.serializers
+    """
+    from api.models.user import UserModel
+    from api.models.note import NoteModel
+    from api.models.tag import TagModel
+    from api.schemas.note import NoteResponseSchema
+    from api.serializers import FastSerializer, dump_note
+
+    schema = NoteResponseSchema(many=True)
+    fast = FastSerializer(dump_note, many=True)
+    click.echo(f"{'notes':>8} {'marshmallow, ms':>16} {'fast, ms':>10} {'speedup':>8}")
+    for notes_count in [int(count) for count in notes.split(',')]:
+        with temporary_db():
+            user = UserModel(username='bench', password='bench')
+            user.save()
+            tags_lst = [TagModel(author_id=user.id, name=f'tag {i}') for i in range(tags)]
+            db.session.add_all(tags_lst)
+            db.session.add_all(NoteModel(author_id=user.id, note=f'note {i}', tags=tags_lst)
+                               for i in range(notes_count))
+            db.session.commit()
+            items = NoteModel.query.options(*NoteModel.serialization_options()).all()
+            if schema.dump(items) != fast.dump(items):
+                raise click.ClickException("Результаты сериализации не совпадают")
+            slow_time = measure(lambda: schema.dump(items), repeat)
+            fast_time = measure(lambda: fast.dump(items), repeat)
+            click.echo(f"{notes_count:>8} {slow_time:>16.1f} {fast_time:>10.1f} {slow_time / fast_time:>7.1f}x")
+
+
+@app.cli.command('bench-json')
+@click.option('--notes', default='1000,5000,20000', help='Количество заметок пользователя, через запятую')
+@click.option('--repeat', default=5, help='Количество повторов запроса')
+def bench_json(notes, repeat):
+    """
+    Сравнивает кодировщики JSON (json и orjson) на ответе /notes со всеми заметками пользователя
+    """
+    from config import Config
+    from api.encoding import orjson, dumps
+    from api.schemas.note import NoteResponseSchema
+    from api.models.user import UserModel
+    from api.models.note import NoteModel
+    from api.models.tag import TagModel
+
+    if orjson is None:
+        raise click.ClickException("orjson не установлен")
+    encoder = Config.JSON_ENCODER
+    click.echo(f"{'notes':>8} {'size, KB':>9} {'json, ms':>10} {'orjson, ms':>11} {'speedup':>8} "
+               f"{'encode json, ms':>16} {'encode orjson, ms':>18}")
+    for notes_count in [int(count) for count in notes.split(',')]:
+        with temporary_db():
+            user = UserModel(username='bench', password='bench')
+            user.save()
+            tags_lst = [TagModel(author_id=user.id, name=f'tag {i}') for i in range(3)]
+            db.session.add_all(tags_lst)
+            db.session.add_all(NoteModel(author_id=user.id, note=f'note {i} ' * 10, tags=tags_lst)
+                               for i in range(notes_count))
+            db.session.commit()
+            client = app.test_client()
+            headers = {'Authorization': 'Basic ' + b64encode(b'bench:bench').decode('utf-8')}
+            timings = {}
+            try:
+                for name in ('json', 'orjson'):
+                    Config.JSON_ENCODER = name
+                    size = len(client.get('/notes', headers=headers).data)
+                    timings[name] = measure(lambda: client.get('/notes', headers=headers), repeat)
+                    # Только кодирование уже сериализованных данных, без запроса к БД и marshmallow
+                    with app.test_request_context():
+                        data = NoteResponseSchema(many=True).dump(NoteModel.query.all())
+                        timings['encode ' + name] = measure(lambda: dumps(data), repeat)
+            finally:
+                Config.JSON_ENCODER = encoder
+            click.echo(f"{notes_count:>8} {size / 1024:>9.0f} {timings['json']:>10.1f} {timings['orjson']:>11.1f} "
+                       f"{timings['json'] / timings['orjson']:>7.2f}x {timings['encode json']:>16.1f} "
+                       f"{timings['encode orjson']:>18.1f}")
@@ -0,0 +1,43 @@
+import hashlib
+from flask import Response, request
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+from api.models.version import VersionModel
+
+"""
+Условные GET-запросы: ETag и Last-Modified коллекций вычисляются по их версиям
+"""
+
+
+def validators(scope, weak=False):
+    """
+    Вычисляет заголовки ETag и Last-Modified коллекции для текущего запроса.
+    ETag зависит от версии коллекции, пути и параметров запроса, поэтому у каждой страницы он свой
+    :param scope: имя коллекции
+    :param weak: слабый ETag
+    :return: заголовки
+    """
+    version, modified = VersionModel.get(scope)
+    key = f"{scope}:{version}:{request.path}?{request.query_string.decode('latin-1')}"
+    headers = {'ETag': quote_etag(hashlib.sha1(key.encode('utf-8')).hexdigest(), weak)}
+    if modified is not None:
+        headers['Last-Modified'] = http_date(modified)
+    return headers
+
+
+def not_modified(headers):
+    """
+    Проверяет, есть ли у клиента актуальная версия ответа (If-None-Match, If-Modified-Since)
+    :param headers: заголовки, полученные из validators
+    :return: bool
+    """
+    return not is_resource_modified(request.environ, etag=headers['ETag'],
+                                    last_modified=headers.get('Last-Modified'))
+
+
+def not_modified_response(headers):
+    """
+    Ответ 304 без тела
+    :param headers: заголовки, полученные из validators
+    :return: ответ
+    """
+    return Response(status=304, headers=headers)
@@ -0,0 +1,66 @@
+import json
+from flask import current_app
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson не обязателен
+    orjson = None
+
+"""
+Кодирование ответов в JSON. Если установлен orjson и он выбран в настройках, используется он,
+иначе - стандартный модуль json. Типы, которые orjson не кодирует сам (в том числе даты),
+кодируются так же, как в flask.jsonify, поэтому ответ не зависит от выбранного кодировщика
+"""
+
+
+def fast_encoder_enabled():
+    """
+    Проверяет, используется ли orjson
+    :return: bool
+    """
+    return orjson is not None and Config.JSON_ENCODER == 'orjson'
+
+
+def dumps(data):
+    """
+    Кодирует данные в JSON. В режиме отладки JSON форматируется с отступами.
+    Если orjson не может закодировать данные (например, целое больше 64 бит), используется json
+    :param data: данные
+    :return: JSON, bytes
+    """
+    encoder = current_app.json_encoder
+    if fast_encoder_enabled():
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+        if current_app.debug:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, default=encoder().default, option=option)
+        except orjson.JSONEncodeError:
+            pass
+    settings = dict(current_app.config.get('RESTFUL_JSON', {}))
+    if current_app.debug:
+        settings.setdefault('indent', 4)
+    return (json.dumps(data, cls=encoder, **settings) + "\n").encode('utf-8')
+
+
+def output_json(data, code, headers=None):
+    """
+    Представление application/json для Flask-RESTful
+    :param data: данные
+    :param code: код ответа
+    :param headers: заголовки ответа
+    :return: ответ
+    """
+    resp = current_app.response_class(dumps(data), status=code, mimetype='application/json')
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def json_response(data):
+    """
+    Ответ с сериализованными данными для flask_apispec (APISPEC_FORMAT_RESPONSE) вместо flask.jsonify
+    :param data: данные
+    :return: ответ
+    """
+    return current_app.response_class(dumps(data), mimetype='application/json')
@@ -1,15 +1,27 @@
-from api import db
+from api import db, Config
+from itertools import islice
+from sqlalchemy import func, exists, select, and_, literal
+from sqlalchemy.orm import joinedload, selectinload, lazyload, load_only
+from api.sparse import wants, nested
+from api.pagination import paginate, ordered, encode_cursor, decode_last_id
+from api.tag_index import tag_index, iter_bits
 from api.models.user import UserModel
 from api.models.tag import TagModel
 from datetime import datetime
 
 tags = db.Table('tags',
                     db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
-                    db.Column('note_model_id', db.Integer, db.ForeignKey('note_model.id'), primary_key=True)
+                    db.Column('note_model_id', db.Integer, db.ForeignKey('note_model.id'), primary_key=True),
+                    db.Index('ix_tags_note_model_id', 'note_model_id')
                     )
 
 
 class NoteModel(db.Model):
+    __table_args__ = (
+        db.Index('ix_note_model_author_id_date', 'author_id', 'date'),
+        db.Index('ix_note_model_author_id_archive_date', 'author_id', 'archive', 'date'),
+        db.Index('ix_note_model_private_archive_date', 'private', 'archive', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     note = db.Column(db.String(300), unique=False, nullable=False)
     date = db.Column(db.DateTime, default=datetime.now)
@@ -21,36 +33,343 @@ class NoteModel(db.Model):
     tags = db.relationship(TagModel, secondary=tags, lazy='subquery', backref=db.backref('notes', lazy=True))
 
     @classmethod
-    def get_all_notes(cls, author, archive):
+    def get_all_notes(cls, author, archive, limit=None, cursor=None, sparse_fields=None):
         """
-        Фильтрует заметки по признаку "архива"
+        Фильтрует заметки по признаку "архива", упорядочивая по дате создания.
+        При заданном limit возвращает одну страницу
         :param author: автор заметки
         :param archive: флаг "архива"
-        :return: заметки
+        :param limit: размер страницы
+        :param cursor: курсор предыдущей страницы
+        :param sparse_fields: запрошенные поля ответа, незапрошенные связи не загружаются
+        :return: заметки и курсор следующей страницы
         """
-        if archive == "all":
-            return NoteModel.query.filter_by(author_id=author.id).all()
+        query = cls.author_notes_query(author, archive).options(*cls.serialization_options(sparse_fields))
+        return paginate(query, [NoteModel.date, NoteModel.id], limit, cursor)
+
+    @classmethod
+    def author_notes_query(cls, author, archive):
+        """
+        Запрос заметок пользователя по признаку "архива"
+        :param author: автор заметки
+        :param archive: флаг "архива"
+        :return: запрос
+        """
+        query = NoteModel.query.filter_by(author_id=author.id)
+        if archive == "no_archive":
+            query = query.filter_by(archive=False)
+        if archive == "archive":
+            query = query.filter_by(archive=True)
+        return query
+
+    @classmethod
+    def iter_all_notes(cls, author, archive, cursor=None, sparse_fields=None):
+        """
+        Перебирает заметки пользователя в том же порядке, что и get_all_notes,
+        загружая их из БД пачками по STREAM_CHUNK_SIZE.
+        Теги подгружаются отдельным запросом на пачку, автор - в запросе заметок,
+        поэтому в памяти одновременно находится только одна пачка
+        :param author: автор заметки
+        :param archive: флаг "архива"
+        :param cursor: курсор, после которого начинается перебор
+        :param sparse_fields: запрошенные поля ответа, незапрошенные связи не загружаются
+        :return: запрос, перебираемый пачками
+        """
+        query = cls.author_notes_query(author, archive).options(*cls.serialization_options(sparse_fields))
+        return ordered(query, [NoteModel.date, NoteModel.id], cursor).yield_per(Config.STREAM_CHUNK_SIZE)
+
+    @classmethod
+    def serialization_options(cls, fields=None, columns=()):
+        """
+        Опции загрузки для NoteResponseSchema, чтобы выдача списка заметок выполнялась фиксированным числом
+        запросов: автор загружается в запросе заметок, теги с их авторами - одним запросом на страницу.
+        Загружаются только запрошенные столбцы и связи. Связи загруженных пользователей (все их заметки и теги)
+        не нужны схеме, обращение к ним вызывает ошибку, а не запрос на каждого автора
+        :param fields: запрошенные поля схемы, None - все поля
+        :param columns: столбцы, которые загружаются всегда (например, для проверки доступа)
+        :return: опции запроса
+        """
+        options = []
+        if fields is not None:
+            loaded = [name for name in fields if name in cls.__table__.columns.keys()] + list(columns)
+            options.append(load_only(*loaded or ['id']))
+        if wants(fields, 'author'):
+            options.append(joinedload(cls.author).load_only('id', 'username').raiseload('*'))
+        else:
+            options.append(lazyload(cls.author))
+        if wants(fields, 'tags'):
+            options.append(TagModel.nested_options(selectinload(cls.tags), nested(fields, 'tags')))
+        else:
+            options.append(lazyload(cls.tags))
+        return options
+
+    @classmethod
+    def get_all_public_notes(cls, limit, cursor=None, sparse_fields=None):
+        """
+        Фильтрует заметки по признаку "публичности", начиная с самых новых
+        :param limit: размер страницы
+        :param cursor: курсор предыдущей страницы
+        :param sparse_fields: запрошенные поля ответа, незапрошенные связи не загружаются
+        :return: публичные заметки и курсор следующей страницы
+        """
+        query = NoteModel.query.filter_by(private=False, archive=False)\
+            .options(*cls.serialization_options(sparse_fields))
+        return paginate(query, [NoteModel.date, NoteModel.id], limit, cursor, descending=True)
+
+    @classmethod
+    def get_notes_filtered_by_tags(cls, tag_names, match="any", exclude=(), limit=None, cursor=None,
+                                   sparse_fields=None):
+        """
+        Фильтрует не архивные заметки по тегам одним запросом, в порядке создания заметок.
+        При включенном индексе тегов в памяти из БД загружается только итоговая страница
+        :param tag_names: имена тегов
+        :param match: "any" - заметки хотя бы с одним из тегов, "all" - заметки со всеми тегами
+        :param exclude: имена тегов, заметки с которыми исключаются
+        :param limit: размер страницы
+        :param cursor: курсор предыдущей страницы
+        :param sparse_fields: запрошенные поля ответа, незапрошенные связи не загружаются
+        :return: заметки и курсор следующей страницы
+        """
+        if Config.TAG_INDEX_ENABLED:
+            return cls.get_notes_filtered_by_tag_index(tag_names, match, exclude, limit, cursor, sparse_fields)
+        query = NoteModel.query.filter(NoteModel.id.in_(cls.tagged_note_ids(tag_names, match)),
+                                       NoteModel.archive == False)
+        if exclude:
+            query = query.filter(NoteModel.id.notin_(cls.tagged_note_ids(exclude)))
+        query = query.options(*cls.serialization_options(sparse_fields))
+        return paginate(query, [NoteModel.id], limit, cursor)
+
+    @classmethod
+    def tagged_note_ids(cls, tag_names, match="any"):
+        """
+        Подзапрос id заметок с тегами
+        :param tag_names: имена тегов
+        :param match: "any" - заметки хотя бы с одним из тегов, "all" - заметки со всеми тегами
+        :return: подзапрос
+        """
+        tag_names = set(tag_names)
+        note_ids = db.session.query(tags.c.note_model_id).join(TagModel, TagModel.id == tags.c.tag_id)\
+            .filter(TagModel.name.in_(tag_names)).group_by(tags.c.note_model_id)
+        if match == "all":
+            note_ids = note_ids.having(func.count() == len(tag_names))
+        return note_ids.subquery()
+
+    @classmethod
+    def get_notes_filtered_by_tag_index(cls, tag_names, match="any", exclude=(), limit=None, cursor=None,
+                                        sparse_fields=None):
+        """
+        Фильтрует не архивные заметки по тегам через индекс тегов в памяти.
+        Заметки итоговой страницы загружаются из БД по первичному ключу
+        :param tag_names: имена тегов
+        :param match: "any" - заметки хотя бы с одним из тегов, "all" - заметки со всеми тегами
+        :param exclude: имена тегов, заметки с которыми исключаются
+        :param limit: размер страницы
+        :param cursor: курсор предыдущей страницы
+        :param sparse_fields: запрошенные поля ответа, незапрошенные связи не загружаются
+        :return: заметки и курсор следующей страницы
+        """
+        after = decode_last_id(cursor)
+        note_ids = list(islice(iter_bits(tag_index.select(tag_names, match, exclude), after),
+                               limit + 1 if limit else None))
+        next_cursor = None
+        if limit and len(note_ids) > limit:
+            note_ids = note_ids[:limit]
+            next_cursor = encode_cursor(note_ids[-1:])
+        query = NoteModel.query.options(*cls.serialization_options(sparse_fields))
+        notes = []
+        for start in range(0, len(note_ids), Config.MAX_PAGE_SIZE):
+            chunk = note_ids[start:start + Config.MAX_PAGE_SIZE]
+            notes += query.filter(NoteModel.id.in_(chunk), NoteModel.archive == False)\
+                .order_by(NoteModel.id).all()
+        return notes, next_cursor
+
+    @classmethod
+    def insert_many(cls, author_id, items, tag_ids=()):
+        """
+        Добавляет заметки в текущей транзакции пачками по NOTE_BATCH_CHUNK_SIZE, не фиксируя ее.
+        Теги привязываются одним пакетным INSERT на каждую пачку
+        :param author_id: id автора заметок
+        :param items: параметры заметок
+        :param tag_ids: id тегов, привязываемых ко всем заметкам
+        :return: созданные заметки
+        """
+        notes = []
+        for start in range(0, len(items), Config.NOTE_BATCH_CHUNK_SIZE):
+            chunk = [cls(author_id=author_id, **item) for item in items[start:start + Config.NOTE_BATCH_CHUNK_SIZE]]
+            db.session.add_all(chunk)
+            db.session.flush()
+            if tag_ids:
+                db.session.execute(tags.insert(), [{'tag_id': tag_id, 'note_model_id': note.id}
+                                                   for note in chunk for tag_id in tag_ids])
+            notes += chunk
+        return notes
+
+    @classmethod
+    def get_owned_states(cls, author_id, note_ids):
+        """
+        Загружает флаги заметок для пакетных операций, не загружая сами заметки
+        :param author_id: id пользователя
+        :param note_ids: id заметок
+        :return: словарь id -> строка (id, private, archive) для заметок пользователя и id чужих заметок
+        """
+        owned, forbidden = {}, []
+        note_ids = list(note_ids)
+        for start in range(0, len(note_ids), Config.NOTE_BATCH_CHUNK_SIZE):
+            chunk = note_ids[start:start + Config.NOTE_BATCH_CHUNK_SIZE]
+            for row in db.session.query(cls.id, cls.author_id, cls.private, cls.archive).filter(cls.id.in_(chunk)):
+                if row.author_id == author_id:
+                    owned[row.id] = row
+                else:
+                    forbidden.append(row.id)
+        return owned, forbidden
+
+    @classmethod
+    def update_many(cls, author_id, note_ids, values):
+        """
+        Изменяет заметки пользователя одним UPDATE на пачку id, не фиксируя транзакцию.
+        Принадлежность заметок пользователю проверяется в условии запроса
+        :param author_id: id пользователя
+        :param note_ids: id заметок
+        :param values: новые значения полей
+        :return: количество измененных заметок
+        """
+        updated = 0
+        for start in range(0, len(note_ids), Config.NOTE_BATCH_CHUNK_SIZE):
+            chunk = note_ids[start:start + Config.NOTE_BATCH_CHUNK_SIZE]
+            updated += cls.query.filter(cls.id.in_(chunk), cls.author_id == author_id)\
+                .update(values, synchronize_session=False)
+        return updated
+
+    @classmethod
+    def delete_many(cls, author_id, note_ids):
+        """
+        Удаляет заметки пользователя и их привязки к тегам одним DELETE на пачку id, не фиксируя транзакцию.
+        Принадлежность заметок пользователю проверяется в условии запроса
+        :param author_id: id пользователя
+        :param note_ids: id заметок
+        :return: количество удаленных заметок
+        """
+        deleted = 0
+        for start in range(0, len(note_ids), Config.NOTE_BATCH_CHUNK_SIZE):
+            chunk = note_ids[start:start + Config.NOTE_BATCH_CHUNK_SIZE]
+            owned = db.session.query(cls.id).filter(cls.id.in_(chunk), cls.author_id == author_id)
+            db.session.execute(tags.delete().where(tags.c.note_model_id.in_(owned.subquery())))
+            deleted += cls.query.filter(cls.id.in_(chunk), cls.author_id == author_id)\
+                .delete(synchronize_session=False)
+        return deleted
+
+    @classmethod
+    def owned_ids_queries(cls, author_id, note_ids=None, archive="all"):
+        """
+        Подзапросы id заметок пользователя, заданных списком id или фильтром "архива".
+        Список id разбивается на пачки по NOTE_BATCH_CHUNK_SIZE
+        :param author_id: id пользователя
+        :param note_ids: id заметок, None - все заметки пользователя по фильтру
+        :param archive: фильтр "архива" - "all", "no_archive" или "archive"
+        :return: подзапросы
+        """
+        query = db.session.query(cls.id).filter(cls.author_id == author_id)
         if archive == "no_archive":
-            return NoteModel.query.filter_by(author_id=author.id, archive=False).all()
+            query = query.filter(cls.archive == False)
         if archive == "archive":
-            return NoteModel.query.filter_by(author_id=author.id, archive=True).all()
+            query = query.filter(cls.archive == True)
+        if note_ids is None:
+            return [query]
+        note_ids = list(note_ids)
+        return [query.filter(cls.id.in_(note_ids[start:start + Config.NOTE_BATCH_CHUNK_SIZE]))
+                for start in range(0, len(note_ids), Config.NOTE_BATCH_CHUNK_SIZE)]
+
+    @classmethod
+    def attach_tags_many(cls, author_id, tag_ids, note_queries):
+        """
+        Привязывает теги пользователя к его заметкам одним INSERT ... SELECT на пачку заметок,
+        уже существующие привязки пропускаются. Транзакция не фиксируется
+        :param author_id: id пользователя
+        :param tag_ids: id тегов
+        :param note_queries: подзапросы id заметок из owned_ids_queries
+        :return: количество добавленных привязок
+        """
+        inserted = 0
+        for note_query in note_queries:
+            note_ids = note_query.subquery()
+            pairs = select([TagModel.id, note_ids.c.id])\
+                .where(and_(TagModel.id.in_(set(tag_ids)), TagModel.author_id == author_id))\
+                .where(~exists().where(and_(tags.c.tag_id == TagModel.id, tags.c.note_model_id == note_ids.c.id)))
+            inserted += db.session.execute(tags.insert().from_select(['tag_id', 'note_model_id'], pairs)).rowcount
+        return inserted
 
     @classmethod
-    def get_all_public_notes(cls):
+    def detach_tags_many(cls, author_id, tag_ids, note_queries):
         """
-        Фильтрует заметки по признаку "публичности"
-        :return: публичные заметки
+        Отвязывает теги пользователя от его заметок одним DELETE на пачку заметок. Транзакция не фиксируется
+        :param author_id: id пользователя
+        :param tag_ids: id тегов
+        :param note_queries: подзапросы id заметок из owned_ids_queries
+        :return: количество удаленных привязок
         """
-        return NoteModel.query.filter_by(private=False, archive=False).all()
+        owned_tags = db.session.query(TagModel.id).filter(TagModel.id.in_(set(tag_ids)), TagModel.author_id == author_id)
+        deleted = 0
+        for note_query in note_queries:
+            deleted += db.session.execute(tags.delete().where(and_(tags.c.tag_id.in_(owned_tags.subquery()),
+                                                                   tags.c.note_model_id.in_(note_query.subquery())))
+                                          ).rowcount
+        return deleted
 
     @classmethod
-    def get_notes_filtered_by_tags(cls, tag_name):
+    def has_public(cls, note_queries):
+        """
+        Проверяет, есть ли среди заметок публичные
+        :param note_queries: подзапросы id заметок из owned_ids_queries
+        :return: bool
+        """
+        return any(db.session.query(cls.id).filter(cls.id.in_(note_query.subquery()), cls.private == False,
+                                                  cls.archive == False).first()
+                   for note_query in note_queries)
+
+    def get_tag_ids(self, tag_ids):
+        """
+        Выбирает из заданных тегов привязанные к заметке, не загружая теги
+        :param tag_ids: id тегов
+        :return: множество id привязанных тегов
+        """
+        return {tag_id for tag_id, in db.session.query(tags.c.tag_id)
+                .filter(tags.c.note_model_id == self.id, tags.c.tag_id.in_(set(tag_ids)))}
+
+    def attach_tags(self, tag_ids):
+        """
+        Привязывает теги автора заметки к заметке одним INSERT ... SELECT, уже существующие привязки
+        пропускаются в самом запросе. Транзакция не фиксируется
+        :param tag_ids: id тегов
+        :return: количество добавленных привязок
+        """
+        if not tag_ids:
+            return 0
+        pairs = select([TagModel.id, literal(self.id)])\
+            .where(and_(TagModel.id.in_(set(tag_ids)), TagModel.author_id == self.author_id))\
+            .where(~exists().where(and_(tags.c.tag_id == TagModel.id, tags.c.note_model_id == self.id)))
+        inserted = db.session.execute(tags.insert().from_select(['tag_id', 'note_model_id'], pairs)).rowcount
+        if inserted:
+            db.session.expire(self, ['tags'])
+        return inserted
+
+    def detach_tags(self, tag_ids):
+        """
+        Отвязывает теги от заметки одним DELETE. Транзакция не фиксируется
+        :param tag_ids: id тегов
+        """
+        if not tag_ids:
+            return
+        db.session.execute(tags.delete().where(tags.c.note_model_id == self.id)
+                           .where(tags.c.tag_id.in_(set(tag_ids))))
+        db.session.expire(self, ['tags'])
+
+    @property
+    def public(self):
         """
-        Фильтрует заметки по признакам
-        :param tag_name: имя тэга
-        :return: заметки
+        Признак того, что заметка показывается в ленте публичных заметок.
+        У новой заметки до сохранения флаги могут быть не заданы, тогда действуют значения по умолчанию
         """
-        return NoteModel.query.filter(NoteModel.tags.any(name=tag_name), NoteModel.archive == False).all()
+        return self.private is False and not self.archive
 
     def save(self):
         """
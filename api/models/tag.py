@@ -1,12 +1,36 @@
 from api import db
 from api.models.user import UserModel
+from sqlalchemy.orm import Load
+from api.sparse import wants
 
 
 class TagModel(db.Model):
     __tablename__ = 'tag'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), unique=True, nullable=False)
-    author_id = db.Column(db.Integer, db.ForeignKey(UserModel.id))
+    author_id = db.Column(db.Integer, db.ForeignKey(UserModel.id), index=True)
+
+    @classmethod
+    def nested_options(cls, loader, fields=None):
+        """
+        Дополняет опцию загрузки тегов опциями для TagResponseSchema:
+        автор загружается вместе с тегами, если он запрошен, обращение к его заметкам и тегам вызывает ошибку
+        :param loader: опция загрузки тегов
+        :param fields: запрошенные поля схемы, None - все поля
+        :return: опция запроса
+        """
+        if wants(fields, 'author'):
+            return loader.joinedload(cls.author).load_only('id', 'username').raiseload('*')
+        return loader.lazyload(cls.author)
+
+    @classmethod
+    def serialization_options(cls, fields=None):
+        """
+        Опции загрузки для TagResponseSchema
+        :param fields: запрошенные поля схемы, None - все поля
+        :return: опции запроса
+        """
+        return [cls.nested_options(Load(cls), fields)]
 
     def save(self):
         """
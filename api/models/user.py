@@ -1,13 +1,45 @@
-from api import db, Config
-from passlib.apps import custom_app_context as pwd_context
+from api import db, Config, credential_cache, token_states, password_hasher
+from sqlalchemy.orm import load_only, lazyload
 from itsdangerous import (TimedJSONWebSignatureSerializer
                          as Serializer, BadSignature, SignatureExpired)
 
 
-class UserModel(db.Model):
+class TokenMixin:
+    """
+    Создание токенов из данных пользователя, общих для модели и пользователя из токена
+    """
+
+    def _dump_token(self, token_type, expiration):
+        """
+        Создает подписанный токен. Токен содержит id, имя пользователя и поколение токенов,
+        поэтому проверка токена не требует запроса к БД
+        :param token_type: тип токена - "access" или "refresh"
+        :param expiration: время жизни токена, секунды
+        :return: токен
+        """
+        s = Serializer(Config.SECRET_KEY, expires_in=expiration)
+        return s.dumps({'id': self.id, 'username': self.username, 'gen': self.token_generation,
+                        'typ': token_type})
+
+    # 1.2 создает токен, вызывается в русурсе "токен"
+    def generate_auth_token(self, expiration=Config.ACCESS_TOKEN_EXPIRATION):
+        """
+        Создает токен доступа
+        """
+        return self._dump_token('access', expiration)
+
+    def generate_refresh_token(self, expiration=Config.REFRESH_TOKEN_EXPIRATION):
+        """
+        Создает долгоживущий токен обновления, который обменивается на токен доступа без пароля
+        """
+        return self._dump_token('refresh', expiration)
+
+
+class UserModel(TokenMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(32), unique=True)
     password_hash = db.Column(db.String(128))
+    token_generation = db.Column(db.Integer, default=0, server_default="0", nullable=False)
     notes = db.relationship('NoteModel', backref='author', lazy='joined', cascade="all, delete-orphan")
     tags = db.relationship('TagModel', backref='author', lazy='joined', cascade="all, delete-orphan")
 
@@ -15,28 +47,44 @@ class UserModel(db.Model):
         self.username = username
         self.hash_password(password)
 
+    @classmethod
+    def principal_query(cls):
+        """
+        Запрос пользователя для аутентификации: загружаются только учетные данные,
+        заметки и теги подгружаются только при обращении к ним
+        :return: запрос
+        """
+        return cls.query.options(load_only('id', 'username', 'password_hash', 'token_generation'),
+                                 lazyload('*'))
+
     def hash_password(self, password):
         """
-        Хэширует пароль пользователья при регистрации
+        Хэширует пароль пользователья при регистрации.
+        Выданные ранее токены становятся недействительными
         :param password: пароль пользователя из конструктора
         """
-        self.password_hash = pwd_context.encrypt(password)
+        credential_cache.invalidate(self.username)
+        self.password_hash = password_hasher.hash(password)
+        self.revoke_tokens()
 
-    def verify_password(self, password):
+    def revoke_tokens(self):
         """
-        Проверяет корректность пароля при аутентификаци
-        :param password: пароль пользователя
-        :return: bool
+        Увеличивает поколение токенов пользователя, выданные ранее токены становятся недействительными
         """
-        return pwd_context.verify(password, self.password_hash)
+        self.token_generation = (self.token_generation or 0) + 1
 
-    # 1.2 создает токен, вызывается в русурсе "токен"
-    def generate_auth_token(self, expiration=600):
+    def verify_password(self, password):
         """
-        Создает токен
+        Проверяет корректность пароля при аутентификаци.
+        Если хэш пароля получен устаревшей схемой или с другим числом раундов, пароль перехэшируется
+        :param password: пароль пользователя
+        :return: bool
         """
-        s = Serializer(Config.SECRET_KEY, expires_in=expiration)
-        return s.dumps({'id': self.id})
+        valid, new_hash = password_hasher.verify_and_update(password, self.password_hash)
+        if valid and new_hash:
+            self.password_hash = new_hash
+            db.session.commit()
+        return valid
 
     def save(self):
         """
@@ -44,19 +92,25 @@ class UserModel(db.Model):
         """
         db.session.add(self)
         db.session.commit()
+        token_states.invalidate(self.id)
 
     def delete(self):
         """
         Удаляет пользователя из БД
         """
+        credential_cache.invalidate(self.username)
         db.session.delete(self)
         db.session.commit()
+        token_states.invalidate(self.id)
 
-    # 2.2 проверяет валидность пришедшего токена. Вызывается из init
     @staticmethod
-    def verify_auth_token(token):
+    def load_token(token, token_type):
         """
-        Проверяет валидность пришедшего токена
+        Проверяет подпись, срок действия и тип токена.
+        Поколение токенов пользователя берется из кэша, к БД запрос выполняется только при промахе
+        :param token: токен
+        :param token_type: ожидаемый тип токена - "access" или "refresh"
+        :return: пользователь из токена или None
         """
         s = Serializer(Config.SECRET_KEY)
         try:
@@ -65,5 +119,41 @@ class UserModel(db.Model):
             return None  # valid token, but expired
         except BadSignature:
             return None  # invalid token
-        user = UserModel.query.get(data['id'])
-        return user
+        if data.get('typ', 'access') != token_type:
+            return None
+        state = token_states.get(data['id'])
+        if state is None:
+            row = db.session.query(UserModel.token_generation, UserModel.username).filter_by(id=data['id']).first()
+            state = (row.token_generation, row.username) if row else (None, None)
+            token_states.put(data['id'], *state)
+        if state != (data.get('gen'), data.get('username')):
+            return None  # token revoked
+        return UserPrincipal(data['id'], data['username'], data['gen'])
+
+    # 2.2 проверяет валидность пришедшего токена. Вызывается из init
+    @staticmethod
+    def verify_auth_token(token):
+        """
+        Проверяет валидность пришедшего токена доступа
+        :return: пользователь из токена или None
+        """
+        return UserModel.load_token(token, 'access')
+
+    @staticmethod
+    def verify_refresh_token(token):
+        """
+        Проверяет валидность токена обновления
+        :return: пользователь из токена или None
+        """
+        return UserModel.load_token(token, 'refresh')
+
+
+class UserPrincipal(TokenMixin):
+    """
+    Пользователь, аутентифицированный по токену. Создается без обращения к БД
+    """
+
+    def __init__(self, id, username, token_generation):
+        self.id = id
+        self.username = username
+        self.token_generation = token_generation
@@ -0,0 +1,81 @@
+from api import db
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+
+class VersionModel(db.Model):
+    """
+    Версия коллекции: счетчик, который увеличивается при каждом изменении коллекции.
+    По версии вычисляется ETag, поэтому условный запрос к неизмененной коллекции
+    обходится одним чтением строки по первичному ключу
+    """
+    __tablename__ = 'collection_version'
+    PUBLIC_FEED = 'public_feed'
+
+    scope = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    modified = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @classmethod
+    def get(cls, scope):
+        """
+        Возвращает текущую версию коллекции
+        :param scope: имя коллекции
+        :return: номер версии и время последнего изменения (None, если коллекция не менялась)
+        """
+        row = db.session.query(cls.version, cls.modified).filter_by(scope=scope).first()
+        return (row.version, row.modified) if row else (0, None)
+
+    @classmethod
+    def bump(cls, *scopes):
+        """
+        Увеличивает версии коллекций. Изменение фиксируется вместе с текущей транзакцией,
+        поэтому вызывается до сохранения изменяемых объектов.
+        Строка новой коллекции добавляется в точке сохранения: если ее одновременно добавил
+        другой запрос, точка сохранения откатывается и версия увеличивается повторным UPDATE
+        :param scopes: имена коллекций
+        """
+        now = datetime.utcnow()
+        for scope in sorted(set(scopes)):
+            query = cls.query.filter_by(scope=scope)
+            values = {cls.version: cls.version + 1, cls.modified: now}
+            if query.update(values, synchronize_session=False):
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(scope=scope, version=1, modified=now))
+            except IntegrityError:
+                query.update(values, synchronize_session=False)
+
+    @staticmethod
+    def user_scope(user_id):
+        """
+        Имя коллекции заметок и тегов пользователя
+        :param user_id: id пользователя
+        :return: имя коллекции
+        """
+        return f"user:{user_id}"
+
+    @classmethod
+    def bump_user(cls, user_id):
+        """
+        Увеличивает версию коллекции заметок и тегов пользователя
+        :param user_id: id пользователя
+        """
+        cls.bump(cls.user_scope(user_id))
+
+    @classmethod
+    def bump_public_feed(cls, notes):
+        """
+        Увеличивает версию ленты публичных заметок, если среди заметок есть публичные
+        :param notes: заметки
+        """
+        if any(note.public for note in notes):
+            cls.bump(cls.PUBLIC_FEED)
+
+
+# Строка ленты публичных заметок создается вместе с таблицей, первые изменения ленты ее только обновляют
+event.listen(VersionModel.__table__, 'after_create',
+             lambda target, connection, **kwargs: connection.execute(
+                 target.insert(), {'scope': VersionModel.PUBLIC_FEED, 'version': 0, 'modified': datetime.utcnow()}))
@@ -0,0 +1,147 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from api import abort
+
+"""
+Постраничная выдача по ключу (keyset): страница начинается после последней строки предыдущей,
+поэтому стоимость запроса не зависит от номера страницы
+"""
+
+
+def encode_cursor(values):
+    """
+    Кодирует значения ключа сортировки последней строки страницы в непрозрачный курсор
+    :param values: значения ключа
+    :return: курсор
+    """
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Декодирует курсор. При неверном курсоре отвечает ошибкой 400
+    :param cursor: курсор
+    :param columns: столбцы ключа сортировки
+    :return: значения ключа
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        abort(400, error="Invalid cursor")
+
+
+def decode_value(column, value):
+    """
+    Проверяет тип значения ключа из курсора и преобразует дату
+    :param column: столбец ключа или None, если тип не проверяется
+    :param value: значение из курсора
+    :return: значение ключа
+    """
+    if column is None:
+        return value
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if value is None or isinstance(value, bool) or not isinstance(value, python_type):
+        raise ValueError
+    return value
+
+
+def decode_offset(cursor):
+    """
+    Декодирует курсор выдачи по смещению, который используется там,
+    где порядок строк не задается ключом (например, по релевантности)
+    :param cursor: курсор или None
+    :return: смещение
+    """
+    if not cursor:
+        return 0
+    return decode_non_negative_int(cursor)
+
+
+def decode_last_id(cursor):
+    """
+    Декодирует курсор выдачи по возрастанию id, который хранит id последней строки страницы
+    :param cursor: курсор или None
+    :return: id последней строки предыдущей страницы, 0 - с начала
+    """
+    if not cursor:
+        return 0
+    return decode_non_negative_int(cursor)
+
+
+def decode_non_negative_int(cursor):
+    """
+    Декодирует курсор из одного неотрицательного целого. При неверном курсоре отвечает ошибкой 400
+    :param cursor: курсор
+    :return: целое
+    """
+    value = decode_cursor(cursor, [None])[0]
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        abort(400, error="Invalid cursor")
+    return value
+
+
+def after(columns, values, descending=False):
+    """
+    Условие "строка идет после строки с заданными значениями ключа"
+    :param columns: столбцы ключа сортировки
+    :param values: значения ключа
+    :param descending: сортировка по убыванию
+    :return: условие SQL
+    """
+    column, value = columns[0], values[0]
+    condition = column < value if descending else column > value
+    if len(columns) == 1:
+        return condition
+    return or_(condition, and_(column == value, after(columns[1:], values[1:], descending)))
+
+
+def ordered(query, columns, cursor=None, descending=False):
+    """
+    Упорядочивает запрос по ключу и отбрасывает строки до курсора
+    :param query: запрос
+    :param columns: столбцы ключа сортировки, последний должен быть уникальным
+    :param cursor: курсор предыдущей страницы
+    :param descending: сортировка по убыванию
+    :return: запрос
+    """
+    if cursor:
+        query = query.filter(after(columns, decode_cursor(cursor, columns), descending))
+    return query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+
+def paginate(query, columns, limit=None, cursor=None, descending=False):
+    """
+    Возвращает страницу результатов запроса, упорядоченного по ключу
+    :param query: запрос
+    :param columns: столбцы ключа сортировки, последний должен быть уникальным
+    :param limit: размер страницы, None - все строки
+    :param cursor: курсор предыдущей страницы
+    :param descending: сортировка по убыванию
+    :return: строки страницы и курсор следующей страницы (None для последней страницы)
+    """
+    query = ordered(query, columns, cursor, descending)
+    if limit is None:
+        return query.all(), None
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor([getattr(items[-1], column.key) for column in columns])
+
+
+def page_headers(next_cursor):
+    """
+    Заголовки ответа с курсором следующей страницы
+    :param next_cursor: курсор следующей страницы
+    :return: заголовки
+    """
+    return {'X-Next-Cursor': next_cursor} if next_cursor else {}
@@ -1,32 +1,81 @@
-from api import Resource, reqparse, db, auth, abort, g
+from api import Resource, reqparse, db, auth, abort, g, request
 from api.models.note import NoteModel
 from api.models.tag import TagModel
-from api.schemas.note import NoteResponseSchema, NotePostRequestSchema,\
-                             NotePutRequestSchema, NoteFilterSchema
+from api.models.version import VersionModel
+from api.schemas.note import NoteResponseSchema, NoteListResponseSchema, NotePostRequestSchema,\
+                             NotePutRequestSchema, NoteFilterSchema, NoteListQuerySchema,\
+                             NoteFeedQuerySchema, NoteSearchQuerySchema, NoteBatchRequestSchema,\
+                             NoteIdsRequestSchema, NoteTagsBulkRequestSchema, NoteItemQuerySchema
 from api.schemas.tag import TagsSetRemoveNoteSchema
 from flask_apispec.views import MethodResource
+from sqlalchemy.exc import IntegrityError
 from flask_apispec import marshal_with, doc, use_kwargs
-import pdb
+from api.pagination import page_headers
+from api.tag_index import tag_index
+from api import search, conditional
+from api.streaming import stream_json
+
+
+def check_tags(author, tag_ids):
+    """
+    Проверяет одним запросом, что теги существуют и принадлежат пользователю.
+    Иначе отвечает ошибкой 404 или 403 для первого такого тега
+    :param author: пользователь
+    :param tag_ids: id тегов
+    """
+    owners = dict(db.session.query(TagModel.id, TagModel.author_id).filter(TagModel.id.in_(set(tag_ids))))
+    for tag_id in tag_ids:
+        if tag_id not in owners:
+            abort(404, error=f"Tag with id={tag_id} not found")
+        if owners[tag_id] != author.id:
+            abort(403, error=f"Access denied to tag with id={tag_id}")
+
+
+def set_archive_many(author, note_ids, archive):
+    """
+    Переносит заметки пользователя в архив или восстанавливает их из архива одним UPDATE
+    :param author: пользователь
+    :param note_ids: id заметок
+    :param archive: признак "архива"
+    :return: id измененных, пропущенных (не найденных или уже в нужном состоянии) и чужих заметок
+    """
+    note_ids = list(dict.fromkeys(note_ids))
+    owned, forbidden = NoteModel.get_owned_states(author.id, note_ids)
+    changed = [note_id for note_id in note_ids if note_id in owned and owned[note_id].archive != archive]
+    skipped = [note_id for note_id in note_ids if note_id not in changed and note_id not in forbidden]
+    if changed:
+        if any(not owned[note_id].private for note_id in changed):
+            VersionModel.bump(VersionModel.PUBLIC_FEED)
+        VersionModel.bump_user(author.id)
+        # Число измененных строк не используется: заметка, измененная параллельным запросом между выборкой
+        # и UPDATE, уже в нужном состоянии, поэтому ответ строится по результату выборки
+        NoteModel.update_many(author.id, changed, {NoteModel.archive: archive})
+        db.session.commit()
+        tag_index.set_archived(changed, archive)
+    return {"changed": changed, "skipped": skipped, "forbidden": forbidden}
 
 
 @doc(tags=['Notes'], security=[{"basicAuth": []}])
 class NoteResource(MethodResource):
 
     @auth.login_required
-    @marshal_with(NoteResponseSchema)
+    @use_kwargs(NoteItemQuerySchema, location='query')
+    @marshal_with(NoteResponseSchema())
     @doc(summary="Get note by id")
-    def get(self, note_id):
+    def get(self, note_id, sparse_fields=None):
         """
         Возвращает заметку пользователя.
         Требуется аутентификация.
         :param note_id: id заметки
+        :param sparse_fields: запрошенные поля ответа, незапрошенные столбцы и связи не загружаются
         :return: замтку
         """
         author = g.user
-        note = NoteModel.query.get(note_id)
+        note = NoteModel.query.options(*NoteModel.serialization_options(sparse_fields, columns=['author_id']))\
+            .get(note_id)
         if not note:
             abort(404, error=f"Note with id={note_id} not found")
-        if note.author != author:
+        if note.author_id != author.id:
             abort(403, error=f"Access denied to note with id={note_id}")
         return note, 200
 
@@ -46,14 +95,20 @@ class NoteResource(MethodResource):
         note = NoteModel.query.get(note_id)
         if not note:
             abort(404, error=f"Note with id={note_id} not found")
-        if note.author != author:
+        if note.author_id != author.id:
             abort(403, error=f"Access denied to note with id={note_id}")
+        was_public = note.public
         for key in kwargs.keys():
             setattr(note, key, kwargs[key])
         try:
+            if was_public or note.public:
+                VersionModel.bump(VersionModel.PUBLIC_FEED)
+            VersionModel.bump_user(author.id)
+            search.index_notes([note], commit=False)
             note.save()
             return note, 200
         except:
+            db.session.rollback()
             abort(404, error=f"An error occurred while changing note")
 
     @auth.login_required
@@ -69,10 +124,14 @@ class NoteResource(MethodResource):
         note = NoteModel.query.get(note_id)
         if not note:
             abort(404, error=f"Note with id={note_id} not found")
-        if note.author != author:
+        if note.author_id != author.id:
             abort(403, error=f"Access denied to note with id={note_id}")
         try:
+            VersionModel.bump_public_feed([note])
+            VersionModel.bump_user(author.id)
             note.delete()
+            tag_index.remove_notes([note_id])
+            search.remove_notes([note_id])
             return f"Note with id={note_id} deleted", 200
         except:
             abort(404, error=f"An error occurred while changing note")
@@ -82,20 +141,32 @@ class NoteResource(MethodResource):
 class NoteListResource(MethodResource):
 
     @auth.login_required
+    @use_kwargs(NoteListQuerySchema, location='query')
     @marshal_with(NoteResponseSchema(many=True))
     @doc(summary="Get all notes")
-    def get(self):
+    def get(self, **kwargs):
         """
         Возвращает все заметки пользователя.
         Фильтры поиска не применяются.
+        Если заметки не изменились с версии, указанной в If-None-Match, отвечает 304.
         Требуется аутентификация.
+        :param kwargs: размер страницы, курсор и признак потоковой выдачи, без них возвращаются все заметки
         :return: все заметки
         """
         author = g.user
-        notes = NoteModel.get_all_notes(author, archive="all")
+        validators = conditional.validators(VersionModel.user_scope(author.id), weak=True)
+        if conditional.not_modified(validators):
+            return conditional.not_modified_response(validators)
+        if kwargs.pop("stream"):
+            response = stream_json(NoteModel.iter_all_notes(author, "all", **kwargs),
+                                   NoteResponseSchema().for_request(request), validators)
+            if not response:
+                abort(404, error=f"You have no notes yet")
+            return response
+        notes, next_cursor = NoteModel.get_all_notes(author, archive="all", **kwargs)
         if not notes:
             abort(404, error=f"You have no notes yet")
-        return notes, 200
+        return notes, 200, {**page_headers(next_cursor), **validators}
 
     @auth.login_required
     @use_kwargs(NotePostRequestSchema, location='json')
@@ -110,48 +181,132 @@ class NoteListResource(MethodResource):
         """
         author = g.user
         note = NoteModel(author_id=author.id, **kwargs)
-        note.save()
+        try:
+            VersionModel.bump_public_feed([note])
+            VersionModel.bump_user(author.id)
+            db.session.add(note)
+            db.session.flush()
+            search.index_notes([note], commit=False)
+            note.save()
+        except:
+            db.session.rollback()
+            abort(400, error=f"An error occurred while adding note")
         return note, 201
 
 
+@doc(tags=['Notes'], security=[{"basicAuth": []}])
+class NoteBatchResource(MethodResource):
+
+    @auth.login_required
+    @use_kwargs(NoteBatchRequestSchema, location='json')
+    @doc(summary="Create notes in batch")
+    def post(self, **kwargs):
+        """
+        Создает заметки пользователя пакетом в одной транзакции и привязывает к ним теги.
+        Заметки с ошибками не создаются, остальные создаются.
+        Требуется аутентификация.
+        :param kwargs: параметры заметок в формате списка, id тегов в формате списка
+        :return: id созданных заметок и ошибки по номерам заметок в списке
+        """
+        author = g.user
+        items = kwargs["notes"]
+        tag_ids = set(kwargs["tags"])
+        if tag_ids:
+            check_tags(author, sorted(tag_ids))
+        schema = NotePostRequestSchema()
+        max_length = NoteModel.note.type.length
+        valid, errors = [], {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors[index] = {"_schema": ["Invalid input type."]}
+                continue
+            item_errors = schema.validate(item)
+            if not item_errors and not item.get("note"):
+                item_errors = {"note": ["Missing data for required field."]}
+            if not item_errors and len(item["note"]) > max_length:
+                item_errors = {"note": [f"Longer than maximum length {max_length}."]}
+            if item_errors:
+                errors[index] = item_errors
+            else:
+                valid.append(schema.load(item))
+        if not valid:
+            return {"created": [], "errors": errors}, 422
+        try:
+            notes = NoteModel.insert_many(author.id, valid, tag_ids)
+            note_ids = [note.id for note in notes]
+            VersionModel.bump_public_feed(notes)
+            VersionModel.bump_user(author.id)
+            search.index_notes(notes, commit=False)
+            db.session.commit()
+        except:
+            db.session.rollback()
+            abort(400, error=f"An error occurred while adding notes. No notes were created")
+        tag_index.set_tags(note_ids, tag_ids)
+        return {"created": note_ids, "errors": errors}, 201
+
+
 @doc(tags=['Notes'], security=[{"basicAuth": []}])
 class NoteListNoArchiveResource(MethodResource):
 
     @auth.login_required
+    @use_kwargs(NoteListQuerySchema, location='query')
     @marshal_with(NoteResponseSchema(many=True))
     @doc(summary="Get all no_archive notes")
-    def get(self):
+    def get(self, **kwargs):
         """
         Возвращает все не архивные заметки пользователя.
         Используется фильтр - "не архивные".
+        Если заметки не изменились с версии, указанной в If-None-Match, отвечает 304.
         Требуется аутентификация.
+        :param kwargs: размер страницы, курсор и признак потоковой выдачи, без них возвращаются все заметки
         :return: заметки
         """
         author = g.user
-        notes = NoteModel.get_all_notes(author, archive="no_archive")
+        validators = conditional.validators(VersionModel.user_scope(author.id), weak=True)
+        if conditional.not_modified(validators):
+            return conditional.not_modified_response(validators)
+        if kwargs.pop("stream"):
+            response = stream_json(NoteModel.iter_all_notes(author, "no_archive", **kwargs),
+                                   NoteResponseSchema().for_request(request), validators)
+            if not response:
+                abort(404, error=f"You have no notes yet")
+            return response
+        notes, next_cursor = NoteModel.get_all_notes(author, archive="no_archive", **kwargs)
         if not notes:
             abort(404, error=f"You have no notes yet")
-        return notes, 200
+        return notes, 200, {**page_headers(next_cursor), **validators}
 
 
 @doc(tags=['Notes'], security=[{"basicAuth": []}])
 class NoteListArchiveResource(MethodResource):
 
     @auth.login_required
+    @use_kwargs(NoteListQuerySchema, location='query')
     @marshal_with(NoteResponseSchema(many=True))
     @doc(summary="Get all archive notes")
-    def get(self):
+    def get(self, **kwargs):
         """
         Возвращает все архивные заметки пользователя.
         Используется фильтр - "архивные".
+        Если заметки не изменились с версии, указанной в If-None-Match, отвечает 304.
         Требуется аутентификация.
+        :param kwargs: размер страницы, курсор и признак потоковой выдачи, без них возвращаются все заметки
         :return:
         """
         author = g.user
-        notes = NoteModel.get_all_notes(author, archive="archive")
+        validators = conditional.validators(VersionModel.user_scope(author.id), weak=True)
+        if conditional.not_modified(validators):
+            return conditional.not_modified_response(validators)
+        if kwargs.pop("stream"):
+            response = stream_json(NoteModel.iter_all_notes(author, "archive", **kwargs),
+                                   NoteResponseSchema().for_request(request), validators)
+            if not response:
+                abort(404, error=f"You have no notes yet")
+            return response
+        notes, next_cursor = NoteModel.get_all_notes(author, archive="archive", **kwargs)
         if not notes:
             abort(404, error=f"You have no notes yet")
-        return notes, 200
+        return notes, 200, {**page_headers(next_cursor), **validators}
 
 
 @doc(tags=['Notes'], security=[{"basicAuth": []}])
@@ -171,13 +326,79 @@ class NoteToArchiveResource(MethodResource):
         note = NoteModel.query.get(note_id)
         if not note:
             abort(404, error=f"Note with id={note_id} not found")
-        if note.author != author:
+        if note.author_id != author.id:
             abort(403, error=f"Access denied to note with id={note_id}")
+        VersionModel.bump_public_feed([note])
+        VersionModel.bump_user(author.id)
         note.archive = True
         note.save()
+        tag_index.set_archived([note.id], True)
         return note, 200
 
 
+@doc(tags=['Notes'], security=[{"basicAuth": []}])
+class NoteBulkToArchiveResource(MethodResource):
+
+    @auth.login_required
+    @use_kwargs(NoteIdsRequestSchema, location='json')
+    @doc(summary="Put notes to archive in batch")
+    def put(self, **kwargs):
+        """
+        Изменяет статус заметок пользователя на "архивная" по списку id.
+        Требуется аутентификация.
+        :param kwargs: id заметок в формате списка
+        :return: id измененных, пропущенных и чужих заметок
+        """
+        return set_archive_many(g.user, kwargs["ids"], True), 200
+
+
+@doc(tags=['Notes'], security=[{"basicAuth": []}])
+class NoteBulkRestoreResource(MethodResource):
+
+    @auth.login_required
+    @use_kwargs(NoteIdsRequestSchema, location='json')
+    @doc(summary="Get notes from archive in batch")
+    def put(self, **kwargs):
+        """
+        Изменяет статус заметок пользователя на "не архивная" по списку id.
+        Требуется аутентификация.
+        :param kwargs: id заметок в формате списка
+        :return: id измененных, пропущенных и чужих заметок
+        """
+        return set_archive_many(g.user, kwargs["ids"], False), 200
+
+
+@doc(tags=['Notes'], security=[{"basicAuth": []}])
+class NoteBulkDeleteResource(MethodResource):
+
+    @auth.login_required
+    @use_kwargs(NoteIdsRequestSchema, location='json')
+    @doc(summary="Delete notes in batch")
+    def delete(self, **kwargs):
+        """
+        Удаляет заметки пользователя по списку id одним DELETE.
+        Требуется аутентификация.
+        :param kwargs: id заметок в формате списка
+        :return: id удаленных, не найденных и чужих заметок
+        """
+        author = g.user
+        note_ids = list(dict.fromkeys(kwargs["ids"]))
+        owned, forbidden = NoteModel.get_owned_states(author.id, note_ids)
+        changed = [note_id for note_id in note_ids if note_id in owned]
+        skipped = [note_id for note_id in note_ids if note_id not in owned and note_id not in forbidden]
+        if changed:
+            if any(not row.private and not row.archive for row in owned.values()):
+                VersionModel.bump(VersionModel.PUBLIC_FEED)
+            VersionModel.bump_user(author.id)
+            # Число удаленных строк не используется: заметка, удаленная параллельным запросом между выборкой
+            # и DELETE, тоже удалена, поэтому ответ строится по результату выборки
+            NoteModel.delete_many(author.id, changed)
+            search.remove_notes(changed, commit=False)
+            db.session.commit()
+            tag_index.remove_notes(changed)
+        return {"changed": changed, "skipped": skipped, "forbidden": forbidden}, 200
+
+
 @doc(tags=['Notes'], security=[{"basicAuth": []}])
 class NoteRestoreResource(MethodResource):
 
@@ -195,27 +416,40 @@ class NoteRestoreResource(MethodResource):
         note = NoteModel.query.get(note_id)
         if not note:
             abort(404, error=f"Note with id={note_id} not found")
-        if note.author != author:
+        if note.author_id != author.id:
             abort(403, error=f"Access denied to note with id={note_id}")
         note.archive = False
+        VersionModel.bump_public_feed([note])
+        VersionModel.bump_user(author.id)
         note.save()
+        tag_index.set_archived([note.id], False)
         return note, 200
 
 
 @doc(tags=['Notes'])
 class NotesPublicResource(MethodResource):
 
-    @marshal_with(NoteResponseSchema(many=True))
+    @use_kwargs(NoteFeedQuerySchema, location='query')
+    @marshal_with(NoteListResponseSchema(many=True))
     @doc(summary="Get all public notes")
-    def get(self):
+    def get(self, response_format, **kwargs):
         """
-        Возвращает все публичные заметки пользователя
+        Возвращает ленту публичных заметок пользователей, начиная с самых новых.
+        Лента выдается страницами ограниченного размера.
+        Если лента не изменилась с версии, указанной в If-None-Match, отвечает 304 без запроса заметок
+        :param response_format: "full" - заметки с вложенными авторами и тегами,
+                                "compact" - заметки с id авторов и тегов и словари authors и tags,
+                                формат применяет схема ответа
+        :param kwargs: размер страницы и курсор
         :return: заметки
         """
-        notes = NoteModel.get_all_public_notes()
+        validators = conditional.validators(VersionModel.PUBLIC_FEED)
+        if conditional.not_modified(validators):
+            return conditional.not_modified_response(validators)
+        notes, next_cursor = NoteModel.get_all_public_notes(**kwargs)
         if not notes:
             abort(404, error=f"Public notes not found")
-        return notes, 200
+        return notes, 200, {**page_headers(next_cursor), **validators}
 
 
 @doc(tags=['Notes'], security=[{"basicAuth": []}])
@@ -227,7 +461,8 @@ class NoteSetTagsResource(MethodResource):
     @marshal_with(NoteResponseSchema)
     def put(self, note_id, **kwargs):
         """
-        Присваивает теги к заметке.
+        Присваивает теги к заметке, уже привязанные теги пропускаются.
+        Теги проверяются одним запросом и привязываются одним INSERT.
         Требуется аутентификация.
         :param note_id: id заметки
         :param kwargs: id тегов в формате списка
@@ -237,16 +472,23 @@ class NoteSetTagsResource(MethodResource):
         note = NoteModel.query.get(note_id)
         if not note:
             abort(404, error=f"note with id={note_id} not found")
-        if note.author != author:
+        if note.author_id != author.id:
             abort(403, error=f"Access denied to note with id={note_id}")
-        for tag_id in kwargs["tags"]:
-            tag = TagModel.query.get(tag_id)
-            if not tag:
-                abort(404, error=f"Tag with id={tag_id} not found")
-            if tag.author != author:
-                abort(403, error=f"Access denied to tag with id={tag_id}")
-            note.tags.append(tag)
-        note.save()
+        check_tags(author, kwargs["tags"])
+        # Параллельный запрос мог привязать те же теги между проверкой и вставкой,
+        # тогда повторная попытка пропускает уже существующие привязки
+        for attempt in range(2):
+            try:
+                if note.attach_tags(kwargs["tags"]):
+                    VersionModel.bump_public_feed([note])
+                    VersionModel.bump_user(author.id)
+                    note.save()
+                    tag_index.set_tags([note.id], kwargs["tags"])
+                break
+            except IntegrityError:
+                db.session.rollback()
+                if attempt:
+                    abort(409, error=f"Tags of note with id={note_id} were changed concurrently")
         return note, 200
 
 
@@ -260,6 +502,7 @@ class NoteRemoveTagsResource(MethodResource):
     def put(self, note_id, **kwargs):
         """
         Отвязывает теги от заметки.
+        Теги проверяются одним запросом и отвязываются одним DELETE.
         Требуется аутентификация.
         :param note_id: id заметки
         :param kwargs: id тегов в формате списка
@@ -269,44 +512,121 @@ class NoteRemoveTagsResource(MethodResource):
         note = NoteModel.query.get(note_id)
         if not note:
             abort(404, error=f"note with id={note_id} not found")
-        if note.author != author:
+        if note.author_id != author.id:
             abort(403, error=f"Access denied to note with id={note_id}")
+        check_tags(author, kwargs["tags"])
+        attached = note.get_tag_ids(kwargs["tags"])
         for tag_id in kwargs["tags"]:
-            tag = TagModel.query.get(tag_id)
-            if not tag:
-                abort(404, error=f"Tag with id={tag_id} not found")
-            if tag.author != author:
-                abort(403, error=f"Access denied to tag with id={tag_id}")
-            try:
-                note.tags.remove(tag)
-            except ValueError:
+            if tag_id not in attached:
                 abort(400, error=f"Note with id={note_id} has no tag with id={tag_id}")
-            except:
-                abort(404, error=f"An error occurred while removing tag from note."
-                                 f" May be connection problems with DB. ")
-        note.save()
+        try:
+            note.detach_tags(attached)
+            VersionModel.bump_public_feed([note])
+            VersionModel.bump_user(author.id)
+            note.save()
+        except:
+            abort(404, error=f"An error occurred while removing tag from note."
+                             f" May be connection problems with DB. ")
+        tag_index.remove_tags([note.id], kwargs["tags"])
         return note, 200
 
 
+def change_tags_many(author, kwargs, attach):
+    """
+    Привязывает теги к заметкам пользователя или отвязывает их наборными запросами.
+    Принадлежность заметок и тегов пользователю проверяется в условиях запросов
+    :param author: пользователь
+    :param kwargs: id тегов, id заметок или фильтр "архива"
+    :param attach: привязать теги, иначе отвязать
+    :return: количество измененных привязок
+    """
+    check_tags(author, kwargs["tags"])
+    note_queries = NoteModel.owned_ids_queries(author.id, kwargs.get("ids"), kwargs.get("filter", "all"))
+    if attach:
+        changed = NoteModel.attach_tags_many(author.id, kwargs["tags"], note_queries)
+    else:
+        changed = NoteModel.detach_tags_many(author.id, kwargs["tags"], note_queries)
+    if changed:
+        if NoteModel.has_public(note_queries):
+            VersionModel.bump(VersionModel.PUBLIC_FEED)
+        VersionModel.bump_user(author.id)
+    db.session.commit()
+    if changed:
+        tag_index.invalidate()
+    return {"changed": changed}
+
+
+@doc(tags=['Notes'], security=[{"basicAuth": []}])
+class NoteBulkSetTagsResource(MethodResource):
+
+    @auth.login_required
+    @doc(summary="Set tags to notes in batch")
+    @use_kwargs(NoteTagsBulkRequestSchema, location='json')
+    def put(self, **kwargs):
+        """
+        Привязывает теги к заметкам, заданным списком id или фильтром "архива".
+        Чужие заметки пропускаются, уже привязанные теги тоже.
+        Требуется аутентификация.
+        :param kwargs: id тегов, id заметок или фильтр "all", "no_archive", "archive"
+        :return: количество добавленных привязок
+        """
+        return change_tags_many(g.user, kwargs, attach=True), 200
+
+
+@doc(tags=['Notes'], security=[{"basicAuth": []}])
+class NoteBulkRemoveTagsResource(MethodResource):
+
+    @auth.login_required
+    @doc(summary="Remove tags from notes in batch")
+    @use_kwargs(NoteTagsBulkRequestSchema, location='json')
+    def put(self, **kwargs):
+        """
+        Отвязывает теги от заметок, заданных списком id или фильтром "архива".
+        Чужие заметки пропускаются.
+        Требуется аутентификация.
+        :param kwargs: id тегов, id заметок или фильтр "all", "no_archive", "archive"
+        :return: количество удаленных привязок
+        """
+        return change_tags_many(g.user, kwargs, attach=False), 200
+
+
 @doc(tags=['Notes'])
 class NoteFilterResource(MethodResource):
 
     @doc(summary="Get notes. Filter by tags")
     @use_kwargs(NoteFilterSchema, location='query')
+    @marshal_with(NoteListResponseSchema(many=True))
+    def get(self, response_format, **kwargs):
+        """
+        Возвращает заметки, фильтруя по привязанным тегам.
+        :param response_format: "full" - заметки с вложенными авторами и тегами,
+                                "compact" - заметки с id авторов и тегов и словари authors и tags,
+                                формат применяет схема ответа
+        :param kwargs: теги в формате списка, режим совпадения тегов, исключаемые теги, размер страницы и курсор
+        :return: заметки
+        """
+        notes, next_cursor = NoteModel.get_notes_filtered_by_tags(kwargs.pop("tags"), **kwargs)
+        if not notes:
+            abort(404, error=f"Notes with such tags not found")
+        return notes, 200, page_headers(next_cursor)
+
+
+@doc(tags=['Notes'], security=[{"basicAuth": []}])
+class NoteSearchResource(MethodResource):
+
+    @auth.login_required(optional=True)
+    @doc(summary="Full-text search in notes")
+    @use_kwargs(NoteSearchQuerySchema, location='query')
     @marshal_with(NoteResponseSchema(many=True))
     def get(self, **kwargs):
         """
-        Возвращает заметки, фильтруя по привязанным тегам.
-        :param kwargs: теги в формате списка
+        Ищет заметки по тексту, начиная с наиболее релевантных.
+        Без аутентификации ищет среди публичных заметок, с аутентификацией - также среди своих.
+        Архивные заметки не возвращаются.
+        :param kwargs: поисковая строка, размер страницы и курсор
         :return: заметки
         """
-        notes_lst = []
-        for tag_name in kwargs["tags"]:
-            #pdb.set_trace()
-            notes = NoteModel.get_notes_filtered_by_tags(tag_name)
-            if not notes:
-                abort(404, error=f"Note with tag_name={tag_name} not found")
-            for note in notes:
-                if note not in notes_lst:
-                    notes_lst.append(note)
-        return notes_lst, 200
+        notes, next_cursor = search.search_notes(user=g.get("user"), **kwargs)
+        if not notes:
+            abort(404, error=f"Notes matching the query not found")
+        return notes, 200, page_headers(next_cursor)
@@ -1,8 +1,10 @@
 from flask_apispec.views import MethodResource
 from flask_apispec import marshal_with, doc, use_kwargs
-from api.schemas.tag import TagRequestSchema, TagResponseSchema
+from api.schemas.tag import TagRequestSchema, TagResponseSchema, TagListQuerySchema, TagItemQuerySchema
 from api.models.tag import TagModel
-from api import abort, auth, g
+from api.models.version import VersionModel
+from api import abort, auth, g, conditional
+from api.tag_index import tag_index
 
 
 @doc(tags=['Tags'], security=[{"basicAuth": []}])
@@ -10,19 +12,21 @@ class TagResource(MethodResource):
 
     @auth.login_required
     @doc(summary="Get tag by id")
-    @marshal_with(TagResponseSchema)
-    def get(self, tag_id):
+    @use_kwargs(TagItemQuerySchema, location='query')
+    @marshal_with(TagResponseSchema())
+    def get(self, tag_id, sparse_fields=None):
         """
         Возвращает тег по id.
         Требуется аутентификация.
         :param tag_id: id тега
+        :param sparse_fields: запрошенные поля ответа, незапрошенные связи не загружаются
         :return: тег
         """
         author = g.user
-        tag = TagModel.query.get(tag_id)
+        tag = TagModel.query.options(*TagModel.serialization_options(sparse_fields)).get(tag_id)
         if not tag:
             abort(404, error=f"Tag with id={tag_id} not found")
-        if tag.author != author:
+        if tag.author_id != author.id:
             abort(403, error=f"Access denied to tag with id={tag_id}")
         return tag, 200
 
@@ -42,11 +46,14 @@ class TagResource(MethodResource):
         tag = TagModel.query.get(tag_id)
         if not tag:
             abort(404, error=f"Tag with id={tag_id} not found")
-        if tag.author != author:
+        if tag.author_id != author.id:
             abort(403, error=f"Access denied to tag with id={tag_id}")
         tag.name = kwargs["name"]
         try:
+            VersionModel.bump_public_feed(tag.notes)
+            VersionModel.bump_user(author.id)
             tag.save()
+            tag_index.add_tag(tag.id, tag.name)
             return tag, 200
         except:
             abort(404, error=f"An error occurred while changing tag"
@@ -65,10 +72,13 @@ class TagResource(MethodResource):
         tag = TagModel.query.get(tag_id)
         if not tag:
             abort(404, error=f"Tag with id={tag_id} not found")
-        if tag.author != author:
+        if tag.author_id != author.id:
             abort(403, error=f"Access denied to tag with id={tag_id}")
         try:
+            VersionModel.bump_public_feed(tag.notes)
+            VersionModel.bump_user(author.id)
             tag.delete()
+            tag_index.remove_tag(tag_id)
             return f"Tag with id={tag_id} deleted", 200
         except:
             abort(404, error=f"An error occurred while changing note")
@@ -79,18 +89,25 @@ class TagListResource(MethodResource):
 
     @auth.login_required
     @doc(summary="Get all tags")
+    @use_kwargs(TagListQuerySchema, location='query')
     @marshal_with(TagResponseSchema(many=True))
-    def get(self):
+    def get(self, sparse_fields=None):
         """
         Возвращает все теги пользователя
+        Если теги не изменились с версии, указанной в If-None-Match, отвечает 304.
         Требуется аутентификация.
+        :param sparse_fields: запрошенные поля ответа
         :return: теги
         """
         author = g.user
-        tags = TagModel.query.filter_by(author_id=author.id).all()
+        validators = conditional.validators(VersionModel.user_scope(author.id), weak=True)
+        if conditional.not_modified(validators):
+            return conditional.not_modified_response(validators)
+        tags = TagModel.query.filter_by(author_id=author.id)\
+            .options(*TagModel.serialization_options(sparse_fields)).all()
         if not tags:
             abort(404, error=f"No tags yet")
-        return tags, 200
+        return tags, 200, validators
 
     @auth.login_required
     @doc(summary="Create new tag")
@@ -106,7 +123,9 @@ class TagListResource(MethodResource):
         author = g.user
         tag = TagModel(author_id=author.id, **kwargs)
         try:
+            VersionModel.bump_user(author.id)
             tag.save()
+            tag_index.add_tag(tag.id, tag.name)
             return tag, 201
         except:
             abort(404, error=f"An error occurred while adding new tag"
@@ -1,4 +1,5 @@
-from api import Resource, g, auth
+from api import Resource, reqparse, abort, g, auth
+from api.models.user import UserModel
 
 
 class TokenResource(Resource):
@@ -6,8 +7,45 @@ class TokenResource(Resource):
     def get(self):
         """
         Проверяется есть ли пользователь с тами Username и Password в БД
-        и к нему создается токен через метод def generate_auth_token()
-        :return: токен
+        и к нему создается токен через метод def generate_auth_token().
+        Токен обновления выдается только при входе по паролю, иначе токен доступа
+        позволял бы бессрочно продлевать доступ
+        :return: токен доступа и токен обновления (только при входе по паролю)
         """
         token = g.user.generate_auth_token()
+        if not g.get('password_login'):
+            return {'token': token.decode('ascii')}
+        refresh_token = g.user.generate_refresh_token()
+        return {'token': token.decode('ascii'), 'refresh_token': refresh_token.decode('ascii')}
+
+
+class RefreshTokenResource(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('refresh_token', required=True, location='json')
+
+    def post(self):
+        """
+        Обменивает токен обновления на новый токен доступа.
+        Пароль не требуется, проверяется только подпись и поколение токена
+        :return: токен доступа
+        """
+        args = self.parser.parse_args()
+        user = UserModel.verify_refresh_token(args['refresh_token'])
+        if not user:
+            abort(401, error="Invalid or expired refresh token")
+        token = user.generate_auth_token()
         return {'token': token.decode('ascii')}
+
+    @auth.login_required
+    def delete(self):
+        """
+        Отзывает все выданные пользователю токены доступа и обновления.
+        Требуется аутентификация.
+        :return: сообщение об отзыве токенов
+        """
+        user = UserModel.principal_query().get(g.user.id)
+        if not user:
+            abort(401, error="User not found")
+        user.revoke_tokens()
+        user.save()
+        return f"Tokens of user with id={user.id} revoked", 200
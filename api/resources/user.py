@@ -1,5 +1,7 @@
-from api import abort
+from api import abort, credential_cache, search
 from api.models.user import UserModel
+from api.models.version import VersionModel
+from api.tag_index import tag_index
 from api.schemas.user import UserRequestSchema, UserResponseSchema, UserPutRequestSchema
 from flask_apispec.views import MethodResource
 from flask_apispec import marshal_with, doc, use_kwargs
@@ -54,8 +56,12 @@ class UserResource(MethodResource):
         user = UserModel.query.get(user_id)
         if not user:
             abort(404, error=f"No user with id={user_id}")
+        credential_cache.invalidate(user.username)
         user.username = kwargs["username"]
+        user.revoke_tokens()
         try:
+            VersionModel.bump_public_feed(user.notes)
+            VersionModel.bump_user(user.id)
             user.save()
             return user, 200
         except:
@@ -71,8 +77,13 @@ class UserResource(MethodResource):
         user = UserModel.query.get(user_id)
         if not user:
             abort(404, error=f"User with id={user_id} is not exists")
+        note_ids = [note.id for note in user.notes]
         try:
+            VersionModel.bump_public_feed(user.notes)
+            VersionModel.bump_user(user.id)
             user.delete()
+            tag_index.invalidate()
+            search.remove_notes(note_ids)
             return f"User with id={user_id} deleted", 200
         except:
             abort(404, error=f"An error occurred while deleting the user")
@@ -1,8 +1,11 @@
-from api import ma
+from api import ma, Config
 from api.models.note import NoteModel
 from api.schemas.user import UserResponseSchema
-from api.schemas.tag import TagResponseSchema
-from webargs import fields
+from api.schemas.tag import TagResponseSchema, TagCompactSchema
+from api.sparse import SparseFieldsMixin, SparseFields
+from api.serializers import dump_note
+from webargs import fields, validate
+from marshmallow import validates_schema, pre_dump, ValidationError
 
 
 class NotePostRequestSchema(ma.SQLAlchemySchema):
@@ -25,12 +28,13 @@ class NotePutRequestSchema(ma.SQLAlchemySchema):
     private = ma.Bool(required=False)
 
 
-class NoteResponseSchema(ma.SQLAlchemySchema):
+class NoteResponseSchema(SparseFieldsMixin, ma.SQLAlchemySchema):
     class Meta:
         model = NoteModel
     """
-    Валидационная схема выходных данных 
+    Валидационная схема выходных данных, поддерживает выборочные поля
     """
+    fast_dump = staticmethod(dump_note)
     id = ma.auto_field()
     note = ma.auto_field()
     private = ma.auto_field()
@@ -40,10 +44,172 @@ class NoteResponseSchema(ma.SQLAlchemySchema):
     tags = ma.Nested(TagResponseSchema(many=True))
 
 
+class NoteCompactSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = NoteModel
+    """
+    Схема заметки в компактном формате: вместо автора и тегов - их id
+    """
+    id = ma.auto_field()
+    note = ma.auto_field()
+    private = ma.auto_field()
+    date = ma.auto_field()
+    archive = ma.auto_field()
+    author_id = ma.auto_field()
+    tag_ids = fields.Method("get_tag_ids")
+
+    def get_tag_ids(self, note):
+        return [tag.id for tag in note.tags]
+
+
+class NoteCompactPageSchema(ma.Schema):
+    """
+    Схема списка заметок в компактном формате: заметки ссылаются на авторов и теги по id,
+    а каждый автор и тег сериализуется один раз в словарях authors и tags
+    """
+    notes = fields.List(fields.Nested(NoteCompactSchema))
+    authors = fields.Dict(keys=fields.Str(), values=fields.Nested(UserResponseSchema))
+    tags = fields.Dict(keys=fields.Str(), values=fields.Nested(TagCompactSchema))
+
+    @pre_dump
+    def normalize(self, notes, **kwargs):
+        authors, tags = {}, {}
+        for note in notes:
+            authors.setdefault(str(note.author_id), note.author)
+            for tag in note.tags:
+                tags.setdefault(str(tag.id), tag)
+                authors.setdefault(str(tag.author_id), tag.author)
+        return {"notes": notes, "authors": authors, "tags": tags}
+
+
+class NoteListResponseSchema(NoteResponseSchema):
+    """
+    Валидационная схема выходных данных списка заметок, поддерживает выборочные поля
+    и компактный формат (?format=compact)
+    """
+
+    def for_request(self, request):
+        if request is not None and request.args.get("format") == "compact":
+            return NoteCompactPageSchema()
+        return super().for_request(request)
+
+
+def validate_compact(data):
+    """
+    Компактный формат ответа имеет фиксированный набор полей и не сочетается с выборочными полями
+    :param data: параметры запроса
+    """
+    if data.get("response_format") == "compact" and data.get("sparse_fields"):
+        raise ValidationError("'fields' can not be used with 'format=compact'")
+
+
 class NoteFilterSchema(ma.SQLAlchemySchema):
     class Meta:
         pass
     """
     Валидационная схема входных данных для фильтрации 
     """
-    tags = fields.List(fields.Str())
+    tags = fields.List(fields.Str(), required=True)
+    match = fields.Str(missing="any", validate=validate.OneOf(["any", "all"]))
+    exclude = fields.List(fields.Str(), missing=list)
+    limit = fields.Int(required=False, validate=validate.Range(min=1, max=Config.MAX_PAGE_SIZE))
+    cursor = fields.Str(required=False)
+    sparse_fields = SparseFields(data_key="fields", required=False)
+    response_format = fields.Str(data_key="format", missing="full", validate=validate.OneOf(["full", "compact"]))
+
+    @validates_schema
+    def validate_format(self, data, **kwargs):
+        validate_compact(data)
+
+
+class NoteListQuerySchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема параметров постраничной выдачи.
+    stream - потоковая выдача всех заметок после курсора без ограничения размера
+    """
+    limit = fields.Int(required=False, validate=validate.Range(min=1, max=Config.MAX_PAGE_SIZE))
+    cursor = fields.Str(required=False)
+    stream = fields.Bool(missing=False)
+    sparse_fields = SparseFields(data_key="fields", required=False)
+
+    @validates_schema
+    def validate_stream(self, data, **kwargs):
+        if data.get("stream") and "limit" in data:
+            raise ValidationError("'limit' can not be used with 'stream'")
+
+
+class NoteFeedQuerySchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема параметров ленты публичных заметок
+    """
+    limit = fields.Int(missing=Config.FEED_PAGE_SIZE, validate=validate.Range(min=1, max=Config.FEED_MAX_PAGE_SIZE))
+    cursor = fields.Str(required=False)
+    sparse_fields = SparseFields(data_key="fields", required=False)
+    response_format = fields.Str(data_key="format", missing="full", validate=validate.OneOf(["full", "compact"]))
+
+    @validates_schema
+    def validate_format(self, data, **kwargs):
+        validate_compact(data)
+
+
+class NoteItemQuerySchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема параметров получения заметки
+    """
+    sparse_fields = SparseFields(data_key="fields", required=False)
+
+
+class NoteSearchQuerySchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема параметров полнотекстового поиска
+    """
+    q = fields.Str(required=True, validate=validate.Regexp(r"\S", error="Search query must not be blank."))
+    limit = fields.Int(missing=Config.FEED_PAGE_SIZE, validate=validate.Range(min=1, max=Config.FEED_MAX_PAGE_SIZE))
+    cursor = fields.Str(required=False)
+    sparse_fields = SparseFields(data_key="fields", required=False)
+
+
+class NoteBatchRequestSchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема входных данных пакетного создания заметок.
+    Каждая заметка проверяется отдельно схемой NotePostRequestSchema, поэтому элемент любого типа
+    принимается, а ошибка возвращается по его номеру
+    """
+    notes = fields.List(fields.Raw(allow_none=True), required=True,
+                        validate=validate.Length(min=1, max=Config.NOTE_BATCH_MAX_SIZE))
+    tags = fields.List(fields.Int(), missing=list)
+
+
+class NoteIdsRequestSchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема входных данных пакетных операций над заметками
+    """
+    ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1, max=Config.NOTE_BATCH_MAX_SIZE))
+
+
+class NoteTagsBulkRequestSchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема входных данных пакетной привязки тегов: заметки задаются списком id или фильтром
+    """
+    tags = fields.List(fields.Int(), required=True, validate=validate.Length(min=1))
+    ids = fields.List(fields.Int(), validate=validate.Length(min=1, max=Config.NOTE_BATCH_MAX_SIZE))
+    filter = fields.Str(validate=validate.OneOf(["all", "no_archive", "archive"]))
+
+    @validates_schema
+    def validate_notes(self, data, **kwargs):
+        if ("ids" in data) == ("filter" in data):
+            raise ValidationError("Exactly one of 'ids' and 'filter' is required")
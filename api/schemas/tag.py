@@ -1,6 +1,8 @@
 from api import ma
 from api.models.tag import TagModel
 from api.schemas.user import UserResponseSchema
+from api.sparse import SparseFieldsMixin, SparseFields
+from api.serializers import dump_tag
 from webargs import fields
 
 
@@ -22,12 +24,42 @@ class TagRequestSchema(ma.SQLAlchemySchema):
     name = ma.Str()
 
 
-class TagResponseSchema(ma.SQLAlchemySchema):
+class TagResponseSchema(SparseFieldsMixin, ma.SQLAlchemySchema):
     class Meta:
         model = TagModel
     """
-    Валидационная схема выходных данных 
+    Валидационная схема выходных данных, поддерживает выборочные поля
     """
+    fast_dump = staticmethod(dump_tag)
     id = ma.auto_field()
     name = ma.auto_field()
     author = ma.Nested(UserResponseSchema)
+
+
+class TagCompactSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = TagModel
+    """
+    Схема тега в компактном формате: вместо автора - его id
+    """
+    id = ma.auto_field()
+    name = ma.auto_field()
+    author_id = ma.auto_field()
+
+
+class TagListQuerySchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема параметров списка тегов
+    """
+    sparse_fields = SparseFields(data_key="fields", required=False)
+
+
+class TagItemQuerySchema(ma.SQLAlchemySchema):
+    class Meta:
+        pass
+    """
+    Валидационная схема параметров получения тега
+    """
+    sparse_fields = SparseFields(data_key="fields", required=False)
@@ -0,0 +1,109 @@
+from sqlalchemy import DDL, event, func, or_, text, table, column
+from api import db
+from api.models.note import NoteModel
+from api.pagination import encode_cursor, decode_offset
+
+"""
+Полнотекстовый поиск по тексту заметок.
+SQLite - виртуальная таблица FTS5 note_search, синхронизируется вызовами index_notes/remove_notes.
+PostgreSQL - GIN-индекс по выражению to_tsvector, поддерживается самой БД
+"""
+
+search_table = table('note_search', column('rowid'), column('note'), column('rank'))
+
+create_sqlite_search_table = "CREATE VIRTUAL TABLE IF NOT EXISTS note_search USING fts5(note)"
+create_postgres_search_index = "CREATE INDEX IF NOT EXISTS ix_note_model_note_tsvector " \
+                               "ON note_model USING gin (to_tsvector('simple', note))"
+
+event.listen(NoteModel.__table__, 'after_create',
+             DDL(create_sqlite_search_table).execute_if(dialect='sqlite'))
+event.listen(NoteModel.__table__, 'after_create',
+             DDL(create_postgres_search_index).execute_if(dialect='postgresql'))
+event.listen(NoteModel.__table__, 'before_drop',
+             DDL("DROP TABLE IF EXISTS note_search").execute_if(dialect='sqlite'))
+
+
+def dialect():
+    """
+    Возвращает имя диалекта текущей БД
+    """
+    return db.get_engine().dialect.name
+
+
+def index_notes(notes, commit=True):
+    """
+    Добавляет или обновляет заметки в поисковом индексе
+    :param notes: заметки
+    :param commit: зафиксировать транзакцию, иначе изменение индекса фиксируется вместе с текущей транзакцией
+    """
+    if dialect() != 'sqlite':
+        return
+    rows = [{'id': note.id, 'note': note.note} for note in notes]
+    if rows:
+        db.session.execute(text("INSERT OR REPLACE INTO note_search (rowid, note) VALUES (:id, :note)"), rows)
+        if commit:
+            db.session.commit()
+
+
+def remove_notes(note_ids, commit=True):
+    """
+    Удаляет заметки из поискового индекса
+    :param note_ids: id заметок
+    :param commit: зафиксировать транзакцию, иначе изменение индекса фиксируется вместе с текущей транзакцией
+    """
+    if dialect() != 'sqlite':
+        return
+    rows = [{'id': note_id} for note_id in note_ids]
+    if rows:
+        db.session.execute(text("DELETE FROM note_search WHERE rowid = :id"), rows)
+        if commit:
+            db.session.commit()
+
+
+def fts_query(q):
+    """
+    Преобразует поисковую строку в запрос FTS5: каждое слово ищется как отдельная фраза,
+    поэтому служебный синтаксис FTS5 в строке не интерпретируется
+    :param q: поисковая строка
+    :return: запрос FTS5
+    """
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in q.split())
+
+
+def search_notes(q, user=None, limit=20, cursor=None, sparse_fields=None):
+    """
+    Ищет заметки по тексту, начиная с наиболее релевантных.
+    Архивные заметки не возвращаются, частные - только их автору
+    :param q: поисковая строка
+    :param user: аутентифицированный пользователь или None
+    :param limit: размер страницы
+    :param cursor: курсор предыдущей страницы
+    :param sparse_fields: запрошенные поля ответа, незапрошенные связи не загружаются
+    :return: заметки и курсор следующей страницы
+    """
+    visible = NoteModel.private == False
+    if user is not None:
+        visible = or_(visible, NoteModel.author_id == user.id)
+    query = NoteModel.query.filter(NoteModel.archive == False, visible)\
+        .options(*NoteModel.serialization_options(sparse_fields))
+    engine_dialect = dialect()
+    if engine_dialect == 'sqlite':
+        match = fts_query(q)
+        if not match:
+            return [], None
+        query = query.join(search_table, search_table.c.rowid == NoteModel.id)\
+            .filter(text("note_search MATCH :q").bindparams(q=match))\
+            .order_by(search_table.c.rank, NoteModel.id)
+    elif engine_dialect == 'postgresql':
+        vector = func.to_tsvector('simple', NoteModel.note)
+        ts_query = func.plainto_tsquery('simple', q)
+        query = query.filter(vector.op('@@')(ts_query))\
+            .order_by(func.ts_rank(vector, ts_query).desc(), NoteModel.id)
+    else:
+        query = query.filter(NoteModel.note.ilike(f"%{q}%")).order_by(NoteModel.id)
+    # Порядок по релевантности не задается ключом строки, поэтому курсор хранит смещение
+    offset = decode_offset(cursor)
+    notes = query.offset(offset).limit(limit + 1).all()
+    if len(notes) <= limit:
+        return notes, None
+    return notes[:limit], encode_cursor([offset + limit])
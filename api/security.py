@@ -0,0 +1,378 @@
+import hashlib
+import hmac
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from threading import Lock
+from passlib.context import CryptContext
+from config import Config
+
+"""
+Вспомогательные структуры аутентификации
+"""
+
+
+class CredentialCache:
+    """
+    Ограниченный по размеру кэш успешных проверок пароля с временем жизни записей.
+    Пароль в открытом виде не хранится: запись содержит HMAC-дайджест пары
+    (имя пользователя, пароль) на случайном ключе процесса и хэш пароля из БД,
+    для которого проверка была выполнена.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _digest(self, username, password):
+        """
+        Вычисляет дайджест пары имя пользователя - пароль
+        :param username: имя пользователя
+        :param password: пароль
+        :return: дайджест
+        """
+        message = f"{username}\x00{password}".encode('utf-8')
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def check(self, username, password, password_hash):
+        """
+        Проверяет, подтверждалась ли уже пара имя - пароль для текущего хэша пароля
+        :param username: имя пользователя
+        :param password: пароль
+        :param password_hash: хэш пароля пользователя из БД
+        :return: bool
+        """
+        digest = self._digest(username, password)
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                cached_digest, cached_hash, expires_at = entry
+                if expires_at < time.monotonic():
+                    del self._entries[username]
+                elif cached_hash == password_hash and hmac.compare_digest(cached_digest, digest):
+                    self._entries.move_to_end(username)
+                    self.hits += 1
+                    return True
+            self.misses += 1
+            return False
+
+    def put(self, username, password, password_hash):
+        """
+        Запоминает успешную проверку пароля
+        :param username: имя пользователя
+        :param password: пароль
+        :param password_hash: хэш пароля пользователя из БД
+        """
+        if self.max_size <= 0:
+            return
+        digest = self._digest(username, password)
+        with self._lock:
+            self._entries[username] = (digest, password_hash, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username):
+        """
+        Удаляет запись пользователя из кэша
+        :param username: имя пользователя
+        """
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        """
+        Очищает кэш и счетчики
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Возвращает счетчики кэша
+        :return: словарь с количеством попаданий, промахов и записей
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+class TokenStateCache:
+    """
+    Ограниченный по размеру кэш состояния токенов пользователей с временем жизни записей.
+    Для каждого id пользователя хранит текущие поколение токенов и имя,
+    либо отметку, что пользователь не существует.
+    Время жизни ограничивает задержку, с которой другие процессы узнают об отзыве токенов
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        """
+        Возвращает состояние токенов пользователя
+        :param user_id: id пользователя
+        :return: пара (поколение, имя), (None, None) для удаленного пользователя
+                 или None, если состояние неизвестно
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                state, expires_at = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return state
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, user_id, generation, username):
+        """
+        Запоминает состояние токенов пользователя
+        :param user_id: id пользователя
+        :param generation: поколение токенов, None для удаленного пользователя
+        :param username: имя пользователя
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = ((generation, username), time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        Удаляет состояние пользователя, следующая проверка токена прочитает его из БД
+        :param user_id: id пользователя
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """
+        Очищает кэш и счетчики
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Возвращает счетчики кэша
+        :return: словарь с количеством попаданий, промахов и записей
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+class FailureCache:
+    """
+    Ограниченный по размеру счетчик неудачных входов по паре (имя пользователя, адрес клиента).
+    После limit неудач в пределах окна попытки с той же пары отклоняются
+    без запроса к БД и вычисления хэша до истечения окна
+    """
+
+    def __init__(self, max_size, limit, window):
+        self.max_size = max_size
+        self.limit = limit
+        self.window = window
+        self.failures = 0
+        self.rejected = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def is_blocked(self, username, address):
+        """
+        Проверяет, исчерпан ли лимит неудачных входов
+        :param username: имя пользователя
+        :param address: адрес клиента
+        :return: bool
+        """
+        key = (username, address)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            count, started_at = entry
+            if started_at + self.window < time.monotonic():
+                del self._entries[key]
+                return False
+            if count >= self.limit:
+                self.rejected += 1
+                return True
+            return False
+
+    def record(self, username, address):
+        """
+        Учитывает неудачный вход
+        :param username: имя пользователя
+        :param address: адрес клиента
+        """
+        if self.max_size <= 0:
+            return
+        key = (username, address)
+        now = time.monotonic()
+        with self._lock:
+            self.failures += 1
+            count, started_at = self._entries.get(key, (0, now))
+            if started_at + self.window < now:
+                count, started_at = 0, now
+            self._entries[key] = (count + 1, started_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def reset(self, username, address):
+        """
+        Сбрасывает счетчик после успешного входа
+        :param username: имя пользователя
+        :param address: адрес клиента
+        """
+        with self._lock:
+            self._entries.pop((username, address), None)
+
+    def clear(self):
+        """
+        Очищает кэш и счетчики
+        """
+        with self._lock:
+            self._entries.clear()
+            self.failures = 0
+            self.rejected = 0
+
+    def stats(self):
+        """
+        Возвращает счетчики кэша
+        :return: словарь с количеством неудачных входов, отклоненных попыток и записей
+        """
+        with self._lock:
+            return {'failures': self.failures, 'rejected': self.rejected, 'size': len(self._entries)}
+
+
+@lru_cache(maxsize=8)
+def _load_context(policy):
+    """
+    Восстанавливает контекст passlib в процессе пула
+    :param policy: настройки контекста в формате passlib
+    :return: контекст
+    """
+    return CryptContext.from_string(policy)
+
+
+def _hash_in_pool(policy, password):
+    """
+    Хэширует пароль в процессе пула
+    """
+    return _load_context(policy).hash(password)
+
+
+def _verify_and_update_in_pool(policy, password, password_hash):
+    """
+    Проверяет пароль в процессе пула
+    """
+    return _load_context(policy).verify_and_update(password, password_hash)
+
+
+class PasswordHasher:
+    """
+    Хэширование и проверка паролей. При ненулевом размере пула вычисления выполняются
+    в отдельных процессах и не удерживают GIL потока запроса, иначе - синхронно.
+    При сбое пула операция выполняется синхронно, а пул пересоздается при следующем вызове
+    """
+
+    def __init__(self, context, pool_size=0):
+        self.context = context
+        self.pool_size = pool_size
+        self._policy = context.to_string()
+        self._pool = None
+        self._lock = Lock()
+
+    def _get_pool(self):
+        """
+        Возвращает пул процессов, создавая его при первом обращении
+        :return: пул или None, если пул отключен
+        """
+        if self.pool_size <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.pool_size, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _run(self, pool_func, func, *args):
+        """
+        Выполняет операцию в пуле или синхронно
+        :param pool_func: функция для выполнения в пуле
+        :param func: метод контекста для синхронного выполнения
+        :return: результат операции
+        """
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                return pool.submit(pool_func, self._policy, *args).result()
+            except BrokenProcessPool:
+                self.reset()
+        return func(*args)
+
+    def hash(self, password):
+        """
+        Хэширует пароль
+        :param password: пароль
+        :return: хэш пароля
+        """
+        return self._run(_hash_in_pool, self.context.hash, password)
+
+    def verify_and_update(self, password, password_hash):
+        """
+        Проверяет пароль
+        :param password: пароль
+        :param password_hash: хэш пароля
+        :return: пара (пароль верен, новый хэш или None, если хэш не устарел)
+        """
+        return self._run(_verify_and_update_in_pool, self.context.verify_and_update, password, password_hash)
+
+    def set_pool_size(self, pool_size):
+        """
+        Изменяет размер пула, текущий пул закрывается
+        :param pool_size: количество процессов, 0 - синхронное выполнение
+        """
+        self.reset()
+        self.pool_size = pool_size
+
+    def reset(self, wait=True):
+        """
+        Закрывает пул процессов
+        :param wait: дождаться завершения процессов пула
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+credential_cache = CredentialCache(Config.AUTH_CACHE_SIZE, Config.AUTH_CACHE_TTL)
+token_states = TokenStateCache(Config.TOKEN_STATE_CACHE_SIZE, Config.TOKEN_STATE_CACHE_TTL)
+login_failures = FailureCache(Config.LOGIN_FAILURE_CACHE_SIZE, Config.LOGIN_FAILURE_LIMIT, Config.LOGIN_FAILURE_WINDOW)
+password_hasher = PasswordHasher(Config.PWD_CONTEXT, Config.PASSWORD_HASH_POOL_SIZE)
+
+if hasattr(os, 'register_at_fork'):
+    # Пул, созданный до fork (например, в мастер-процессе gunicorn), в дочернем процессе не работает
+    os.register_at_fork(after_in_child=lambda: password_hasher.reset(wait=False))
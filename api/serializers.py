@@ -0,0 +1,61 @@
+"""
+Быстрая сериализация ответов без marshmallow: функции строят те же словари,
+что NoteResponseSchema, TagResponseSchema и UserResponseSchema, напрямую из атрибутов объектов
+"""
+
+
+def dump_user(user):
+    """
+    Сериализует пользователя как UserResponseSchema
+    :param user: пользователь
+    :return: словарь
+    """
+    return {'id': user.id, 'username': user.username}
+
+
+def dump_tag(tag):
+    """
+    Сериализует тег как TagResponseSchema
+    :param tag: тег
+    :return: словарь
+    """
+    author = tag.author
+    return {'id': tag.id, 'name': tag.name, 'author': dump_user(author) if author is not None else None}
+
+
+def dump_note(note):
+    """
+    Сериализует заметку как NoteResponseSchema
+    :param note: заметка
+    :return: словарь
+    """
+    author = note.author
+    return {
+        'id': note.id,
+        'note': note.note,
+        'private': note.private,
+        'date': note.date.isoformat() if note.date is not None else None,
+        'archive': note.archive,
+        'author': dump_user(author) if author is not None else None,
+        'tags': [dump_tag(tag) for tag in note.tags],
+    }
+
+
+class FastSerializer:
+    """
+    Замена схемы marshmallow для flask_apispec: Wrapper вызывает у схемы только dump
+    """
+
+    def __init__(self, dump_item, many=False):
+        self.dump_item = dump_item
+        self.many = many
+
+    def dump(self, obj):
+        """
+        Сериализует объект или список объектов
+        :param obj: объект или перебираемые объекты
+        :return: словарь или список словарей
+        """
+        if self.many:
+            return [self.dump_item(item) for item in obj]
+        return self.dump_item(obj)
@@ -0,0 +1,105 @@
+from marshmallow import fields as ma_fields
+from api import abort, Config
+from api.serializers import FastSerializer
+
+"""
+Выборочные поля ответа (?fields=id,note,tags.name): схема сериализует только запрошенные поля,
+а запросы к БД не загружают незапрошенные связи
+"""
+
+
+def parse_fields(value):
+    """
+    Разбирает значение параметра fields
+    :param value: имена полей через запятую, вложенные поля - через точку
+    :return: кортеж имен полей или None, если параметр не задан
+    """
+    if not value:
+        return None
+    names = tuple(name.strip() for name in value.split(",") if name.strip())
+    return names or None
+
+
+class SparseFields(ma_fields.String):
+    """
+    Параметр запроса fields. Разбирается той же функцией parse_fields, что и в схеме ответа,
+    поэтому загружаемые из БД столбцы и связи совпадают с сериализуемыми полями
+    """
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        return parse_fields(super()._deserialize(value, attr, data, **kwargs))
+
+
+def wants(fields, name):
+    """
+    Проверяет, запрошено ли поле или его вложенные поля
+    :param fields: запрошенные поля, None - все поля
+    :param name: имя поля
+    :return: bool
+    """
+    return fields is None or any(field == name or field.startswith(name + ".") for field in fields)
+
+
+def nested(fields, name):
+    """
+    Запрошенные вложенные поля поля-связи
+    :param fields: запрошенные поля, None - все поля
+    :param name: имя поля-связи
+    :return: кортеж вложенных полей или None, если запрошены все вложенные поля
+    """
+    if fields is None or name in fields:
+        return None
+    return tuple(field[len(name) + 1:] for field in fields if field.startswith(name + "."))
+
+
+def unknown_fields(schema, fields):
+    """
+    Находит имена полей, которых нет в схеме. Вложенные поля проверяются по схеме поля-связи
+    :param schema: схема marshmallow
+    :param fields: имена полей, вложенные - через точку
+    :return: список неизвестных имен
+    """
+    unknown = []
+    for name in fields:
+        head, _, rest = name.partition(".")
+        field = schema.fields.get(head)
+        if field is None:
+            unknown.append(name)
+        elif rest:
+            nested_schema = getattr(field, "schema", None)
+            if nested_schema is None or unknown_fields(nested_schema, [rest]):
+                unknown.append(name)
+    return unknown
+
+
+class SparseFieldsMixin:
+    """
+    Примесь к схеме ответа. flask_apispec вызывает переданный в marshal_with вызываемый объект с запросом,
+    поэтому для каждого запроса схема заменяется копией, ограниченной полями из параметра fields.
+    marshmallow вызывает вложенную схему без аргументов, тогда она возвращается без изменений,
+    а ее поля ограничивает родительская схема.
+    Если задана функция fast_dump и включена настройка FAST_SERIALIZER, ответ со всеми полями
+    сериализуется этой функцией, а не marshmallow
+    """
+    fast_dump = None
+
+    def __call__(self, request=None):
+        return self.for_request(request)
+
+    def for_request(self, request):
+        """
+        Возвращает схему, ограниченную полями из параметра fields запроса
+        :param request: запрос flask
+        :return: схема
+        """
+        if request is None:
+            return self
+        fields = parse_fields(request.args.get("fields"))
+        if fields is None:
+            if Config.FAST_SERIALIZER and self.fast_dump is not None:
+                return FastSerializer(self.fast_dump, self.many)
+            return self
+        unknown = unknown_fields(self, fields)
+        if unknown:
+            abort(400, error=f"Invalid fields: {', '.join(unknown)}")
+        return self.__class__(many=self.many, only=fields)
@@ -0,0 +1,29 @@
+from flask import Response, stream_with_context
+from api.encoding import dumps
+
+"""
+Потоковая выдача JSON: массив записывается в ответ по одному элементу, не собираясь в памяти целиком
+"""
+
+
+def stream_json(items, schema, headers=None):
+    """
+    Создает потоковый ответ с JSON-массивом сериализованных элементов.
+    Первый элемент загружается до начала ответа, чтобы вызывающий код мог ответить 404 на пустую выдачу
+    :param items: перебираемые элементы, например запрос с yield_per
+    :param schema: схема сериализации одного элемента
+    :param headers: дополнительные заголовки ответа
+    :return: ответ или None, если элементов нет
+    """
+    iterator = iter(items)
+    first = next(iterator, None)
+    if first is None:
+        return None
+
+    def generate():
+        yield b"[" + dumps(schema.dump(first)).rstrip()
+        for item in iterator:
+            yield b"," + dumps(schema.dump(item)).rstrip()
+        yield b"]"
+
+    return Response(stream_with_context(generate()), status=200, headers=headers, mimetype="application/json")
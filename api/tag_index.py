@@ -0,0 +1,238 @@
+import time
+from collections import defaultdict
+from threading import Lock
+from api import db
+from config import Config
+
+"""
+Инвертированный индекс тегов заметок в памяти процесса
+"""
+
+
+def iter_bits(bitmap, after=0):
+    """
+    Перебирает номера установленных битов по возрастанию
+    :param bitmap: битовая маска
+    :param after: перебирать биты с номерами больше заданного
+    :return: генератор номеров битов
+    """
+    bitmap >>= after + 1
+    position = after + 1
+    while bitmap:
+        low = bitmap & -bitmap
+        shift = low.bit_length() - 1
+        position += shift
+        yield position
+        bitmap >>= shift + 1
+        position += 1
+
+
+def to_bitmap(ids):
+    """
+    Строит битовую маску из id. Биты устанавливаются в bytearray, а int создается один раз,
+    поэтому время построения линейно по числу id и размеру маски
+    :param ids: id
+    :return: битовая маска
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for item_id in ids:
+        buffer[item_id >> 3] |= 1 << (item_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class TagIndex:
+    """
+    Отображение тег -> множество id заметок. Множества хранятся битовыми масками (int),
+    поэтому пересечение, объединение и разность множеств выполняются побитовыми операциями.
+    Индекс строится при первом обращении и перестраивается по истечении времени жизни,
+    чтобы учитывать изменения, сделанные другими процессами.
+    Индекс строится без блокировки запросов: пока устаревший индекс перестраивается, запросы используют его,
+    а изменения, учтенные во время построения, повторяются в новом индексе перед заменой.
+    Удаленные заметки отмечаются отдельной маской, маски тегов при удалении не перестраиваются
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._build_lock = Lock()
+        self._built_at = None
+        self._generation = 0
+        self._pending = None
+        self._notes_by_tag = {}
+        self._tag_ids = {}
+        self._archived = 0
+        self._removed = 0
+
+    @staticmethod
+    def _load():
+        """
+        Загружает индекс из БД. id заметок собираются по тегам, маска каждого тега строится один раз
+        :return: маски заметок по id тегов, id тегов по именам, маска архивных заметок
+        """
+        from api.models.note import NoteModel, tags
+        from api.models.tag import TagModel
+
+        note_ids_by_tag = defaultdict(list)
+        for tag_id, note_id in db.session.query(tags.c.tag_id, tags.c.note_model_id):
+            note_ids_by_tag[tag_id].append(note_id)
+        notes_by_tag = {tag_id: to_bitmap(note_ids) for tag_id, note_ids in note_ids_by_tag.items()}
+        tag_ids = {name: tag_id for tag_id, name in db.session.query(TagModel.id, TagModel.name)}
+        archived = to_bitmap(note_id for note_id, in db.session.query(NoteModel.id).filter_by(archive=True))
+        return notes_by_tag, tag_ids, archived
+
+    def _ensure_built(self):
+        """
+        Строит индекс, если он еще не построен или устарел.
+        Устаревший индекс перестраивает один поток, остальные продолжают использовать старый
+        """
+        with self._lock:
+            if self._built_at is not None and self._built_at + self.ttl >= time.monotonic():
+                return
+            missing = self._built_at is None
+        if not self._build_lock.acquire(blocking=missing):
+            return
+        try:
+            with self._lock:
+                if self._built_at is not None and self._built_at + self.ttl >= time.monotonic():
+                    return
+                generation = self._generation
+                self._pending = []
+            try:
+                state = self._load()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                self._notes_by_tag, self._tag_ids, self._archived = state
+                self._removed = 0
+                pending, self._pending = self._pending, None
+                for method, args in pending:
+                    method(*args)
+                # Индекс, сброшенный во время построения, мог не увидеть сброшенные изменения
+                self._built_at = time.monotonic() if generation == self._generation else None
+        finally:
+            self._build_lock.release()
+
+    def _apply(self, method, *args):
+        """
+        Учитывает изменение в построенном индексе и запоминает его, если индекс сейчас строится
+        :param method: метод, изменяющий индекс
+        :param args: аргументы метода
+        """
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((method, args))
+            if self._built_at is not None:
+                method(*args)
+
+    def invalidate(self):
+        """
+        Сбрасывает индекс, он будет построен заново при следующем обращении
+        """
+        with self._lock:
+            self._built_at = None
+            self._generation += 1
+
+    def select(self, tag_names, match="any", exclude=()):
+        """
+        Выбирает не архивные заметки по тегам
+        :param tag_names: имена тегов
+        :param match: "any" - заметки хотя бы с одним из тегов, "all" - заметки со всеми тегами
+        :param exclude: имена тегов, заметки с которыми исключаются
+        :return: битовая маска id заметок
+        """
+        self._ensure_built()
+        with self._lock:
+            bitmaps = [self._notes_by_tag.get(self._tag_ids.get(name), 0) for name in set(tag_names)]
+            if not bitmaps:
+                return 0
+            result = bitmaps[0]
+            for bitmap in bitmaps[1:]:
+                result = result & bitmap if match == "all" else result | bitmap
+            for name in set(exclude):
+                result &= ~self._notes_by_tag.get(self._tag_ids.get(name), 0)
+            return result & ~(self._archived | self._removed)
+
+    def add_tag(self, tag_id, name):
+        """
+        Учитывает новый или переименованный тег
+        :param tag_id: id тега
+        :param name: имя тега
+        """
+        self._apply(self._add_tag, tag_id, name)
+
+    def _add_tag(self, tag_id, name):
+        for old_name in [old_name for old_name, old_id in self._tag_ids.items() if old_id == tag_id]:
+            del self._tag_ids[old_name]
+        self._tag_ids[name] = tag_id
+
+    def remove_tag(self, tag_id):
+        """
+        Учитывает удаление тега
+        :param tag_id: id тега
+        """
+        self._apply(self._remove_tag, tag_id)
+
+    def _remove_tag(self, tag_id):
+        self._notes_by_tag.pop(tag_id, None)
+        for name in [name for name, old_id in self._tag_ids.items() if old_id == tag_id]:
+            del self._tag_ids[name]
+
+    def set_tags(self, note_ids, tag_ids):
+        """
+        Учитывает привязку тегов к заметкам
+        :param note_ids: id заметок
+        :param tag_ids: id тегов
+        """
+        self._apply(self._set_tags, to_bitmap(note_ids), tag_ids)
+
+    def _set_tags(self, notes, tag_ids):
+        reused = notes & self._removed
+        if reused:
+            # id удаленной заметки занят новой: старые привязки удаленной заметки сбрасываются
+            self._removed &= ~reused
+            for tag_id in self._notes_by_tag:
+                self._notes_by_tag[tag_id] &= ~reused
+        for tag_id in tag_ids:
+            self._notes_by_tag[tag_id] = self._notes_by_tag.get(tag_id, 0) | notes
+
+    def remove_tags(self, note_ids, tag_ids):
+        """
+        Учитывает отвязку тегов от заметок
+        :param note_ids: id заметок
+        :param tag_ids: id тегов
+        """
+        self._apply(self._remove_tags, ~to_bitmap(note_ids), tag_ids)
+
+    def _remove_tags(self, notes, tag_ids):
+        for tag_id in tag_ids:
+            if tag_id in self._notes_by_tag:
+                self._notes_by_tag[tag_id] &= notes
+
+    def set_archived(self, note_ids, archived):
+        """
+        Учитывает перенос заметок в архив и восстановление из архива
+        :param note_ids: id заметок
+        :param archived: признак "архива"
+        """
+        self._apply(self._set_archived, to_bitmap(note_ids), archived)
+
+    def _set_archived(self, notes, archived):
+        self._archived = self._archived | notes if archived else self._archived & ~notes
+
+    def remove_notes(self, note_ids):
+        """
+        Учитывает удаление заметок: заметки отмечаются в маске удаленных,
+        маски тегов не изменяются до следующего построения индекса
+        :param note_ids: id заметок
+        """
+        self._apply(self._remove_notes, to_bitmap(note_ids))
+
+    def _remove_notes(self, notes):
+        self._removed |= notes
+
+tag_index = TagIndex(Config.TAG_INDEX_TTL)
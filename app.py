@@ -1,13 +1,16 @@
-from api import app, api, docs
+from api import app, api, docs, benchmarks
 from config import Config
 from api.resources.note import NoteResource, NoteListResource,\
                                NotesPublicResource, NoteSetTagsResource,\
                                NoteFilterResource, NoteRemoveTagsResource,\
                                NoteToArchiveResource, NoteRestoreResource,\
-                               NoteListArchiveResource, NoteListNoArchiveResource
+                               NoteListArchiveResource, NoteListNoArchiveResource,\
+                               NoteSearchResource, NoteBatchResource,\
+                               NoteBulkToArchiveResource, NoteBulkRestoreResource,\
+                               NoteBulkSetTagsResource, NoteBulkRemoveTagsResource, NoteBulkDeleteResource
 from api.resources.user import UserResource, UserListResource
 from api.resources.tag import TagListResource, TagResource
-from api.resources.token import TokenResource
+from api.resources.token import TokenResource, RefreshTokenResource
 from flask import render_template
 
 
@@ -29,6 +32,14 @@ api.add_resource(UserResource, "/users/<int:user_id>")     # GET, PUT, DELETE
 
 api.add_resource(NoteListResource, "/notes")               # GET, POST
 
+api.add_resource(NoteBatchResource, "/notes/batch")        # POST
+
+api.add_resource(NoteBulkToArchiveResource, "/notes/to_archive")  # PUT
+
+api.add_resource(NoteBulkRestoreResource, "/notes/restore")  # PUT
+
+api.add_resource(NoteBulkDeleteResource, "/notes/delete")  # DELETE
+
 api.add_resource(NoteResource, "/notes/<int:note_id>")     # GET, PUT, DELETE
 
 api.add_resource(NoteToArchiveResource, "/notes/<int:note_id>/to_archive")      # PUT
@@ -39,6 +50,8 @@ api.add_resource(NotesPublicResource, "/notes/public")     # GET
 
 api.add_resource(TokenResource, "/auth/token")             # GET
 
+api.add_resource(RefreshTokenResource, "/auth/refresh")    # POST, DELETE
+
 api.add_resource(TagListResource, "/tags")                 # GET, POST
 
 api.add_resource(TagResource, "/tags/<int:tag_id>")        # GET
@@ -47,8 +60,14 @@ api.add_resource(NoteSetTagsResource, "/notes/<int:note_id>/tags/set")  # PUT
 
 api.add_resource(NoteRemoveTagsResource, "/notes/<int:note_id>/tags/remove")  # PUT
 
+api.add_resource(NoteBulkSetTagsResource, "/notes/tags/set")  # PUT
+
+api.add_resource(NoteBulkRemoveTagsResource, "/notes/tags/remove")  # PUT
+
 api.add_resource(NoteFilterResource, "/notes/filter")     # GET
 
+api.add_resource(NoteSearchResource, "/notes/search")     # GET
+
 
 docs.register(UserResource)
 docs.register(UserListResource)
@@ -64,6 +83,13 @@ docs.register(NoteToArchiveResource)
 docs.register(NoteRestoreResource)
 docs.register(NoteListArchiveResource)
 docs.register(NoteListNoArchiveResource)
+docs.register(NoteSearchResource)
+docs.register(NoteBatchResource)
+docs.register(NoteBulkToArchiveResource)
+docs.register(NoteBulkRestoreResource)
+docs.register(NoteBulkDeleteResource)
+docs.register(NoteBulkSetTagsResource)
+docs.register(NoteBulkRemoveTagsResource)
 #docs.register(TokenResource)
 
 
@@ -1,6 +1,7 @@
 import os
 from apispec import APISpec
 from apispec.ext.marshmallow import MarshmallowPlugin
+from passlib.context import CryptContext
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -10,6 +11,25 @@ security_definitions = {
     }
 }
 
+# Схемы, которыми могли быть захэшированы пароли ранее. Проверяются, но при входе перехэшируются
+legacy_password_schemes = ['sha512_crypt', 'sha256_crypt']
+
+
+def password_context(scheme, rounds=None):
+    """
+    Создает контекст хэширования паролей
+    :param scheme: схема хэширования новых паролей
+    :param rounds: количество раундов схемы, None - значение passlib по умолчанию
+    :return: контекст passlib
+    """
+    schemes = [scheme] + [legacy for legacy in legacy_password_schemes if legacy != scheme]
+    settings = {}
+    if rounds:
+        settings.update({f'{scheme}__default_rounds': rounds,
+                         f'{scheme}__min_rounds': rounds,
+                         f'{scheme}__max_rounds': rounds})
+    return CryptContext(schemes=schemes, default=scheme, deprecated='auto', **settings)
+
 
 class Config:
     """
@@ -21,6 +41,38 @@ class Config:
     DEBUG = True
     PORT = 5000
     SECRET_KEY = 'supeR secret KeyS'
+    MAX_PAGE_SIZE = 1000  # Максимальный размер страницы списков заметок
+    FEED_PAGE_SIZE = 20  # Размер страницы ленты публичных заметок по умолчанию
+    FEED_MAX_PAGE_SIZE = 100  # Максимальный размер страницы ленты публичных заметок
+    STREAM_CHUNK_SIZE = 100  # Количество заметок, загружаемых из БД за один шаг при потоковой выдаче
+    NOTE_BATCH_MAX_SIZE = 5000  # Максимальное количество заметок в одном запросе пакетного создания
+    NOTE_BATCH_CHUNK_SIZE = 500  # Количество заметок, добавляемых в БД за один шаг
+    # Кодировщик JSON ответов: orjson (если установлен, иначе json) или json
+    JSON_ENCODER = os.environ.get('JSON_ENCODER') or 'orjson'
+    FAST_SERIALIZER = bool(os.environ.get('FAST_SERIALIZER'))  # Сериализация ответов без marshmallow
+    TAG_INDEX_ENABLED = bool(os.environ.get('TAG_INDEX_ENABLED'))  # Фильтрация по тегам через индекс в памяти
+    TAG_INDEX_TTL = 60  # Время жизни индекса тегов в памяти процесса, секунды
+    PASSWORD_HASH_SCHEME = os.environ.get('PASSWORD_HASH_SCHEME') or 'sha512_crypt'
+    PASSWORD_HASH_ROUNDS = int(os.environ.get('PASSWORD_HASH_ROUNDS') or 0) or None
+    PWD_CONTEXT = password_context(PASSWORD_HASH_SCHEME, PASSWORD_HASH_ROUNDS)
+    # Количество процессов для хэширования паролей, 0 - хэширование в потоке запроса
+    PASSWORD_HASH_POOL_SIZE = int(os.environ.get('PASSWORD_HASH_POOL_SIZE') or 0)
+    AUTH_CACHE_SIZE = 1024  # Количество запомненных успешных проверок пароля
+    AUTH_CACHE_TTL = 300  # Время жизни записи кэша проверок пароля, секунды
+    # Неудачные входы считаются по паре имя пользователя - адрес клиента. Любой клиент с того же адреса
+    # (NAT, общий прокси) может исчерпать лимит и на окно заблокировать вход владельцу имени с этого адреса,
+    # поэтому за обратным прокси адрес клиента должен браться из X-Forwarded-For (PROXY_FIX_X_FOR),
+    # иначе у всех клиентов один адрес прокси и блокируется вход с любого адреса
+    LOGIN_FAILURE_LIMIT = 5  # Количество неудачных входов, после которого попытки отклоняются
+    LOGIN_FAILURE_WINDOW = 300  # Окно подсчета неудачных входов, секунды
+    LOGIN_FAILURE_CACHE_SIZE = 10000  # Количество отслеживаемых пар имя пользователя - адрес
+    # Количество доверенных прокси перед приложением, адрес клиента берется из X-Forwarded-For.
+    # 0 - приложение доступно напрямую, заголовок не используется (иначе клиент может подменить адрес)
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR') or 0)
+    ACCESS_TOKEN_EXPIRATION = 600  # Время жизни токена доступа, секунды
+    REFRESH_TOKEN_EXPIRATION = 30 * 24 * 60 * 60  # Время жизни токена обновления, секунды
+    TOKEN_STATE_CACHE_SIZE = 4096  # Количество пользователей в кэше поколений токенов
+    TOKEN_STATE_CACHE_TTL = 60  # Задержка распространения отзыва токенов между процессами, секунды
     APISPEC_SPEC = APISpec(
         title='Notes Project',
         version='v1',
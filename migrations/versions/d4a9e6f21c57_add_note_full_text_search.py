@@ -0,0 +1,34 @@
+"""Add note full-text search
+
+Revision ID: d4a9e6f21c57
+Revises: 8c41d2e7b5f3
+Create Date: 2026-10-18 15:12:44.301982
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9e6f21c57'
+down_revision = '8c41d2e7b5f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS note_search USING fts5(note)")
+        op.execute("INSERT INTO note_search (rowid, note) SELECT id, note FROM note_model")
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_note_model_note_tsvector "
+                   "ON note_model USING gin (to_tsvector('simple', note))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS note_search")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_note_model_note_tsvector")
@@ -1,10 +1,12 @@
 import pytest
-from api import db
+from api import db, credential_cache, token_states, login_failures
 from app import app
 from api.models.user import UserModel
 from api.models.tag import TagModel
 from api.models.note import NoteModel
+from api.tag_index import tag_index
 from base64 import b64encode
+from sqlalchemy import event
 
 
 @pytest.fixture()
@@ -18,6 +20,10 @@ def db_create():
     app.config.update({
         'SQLALCHEMY_DATABASE_URI': "sqlite:///:memory:"
     })
+    credential_cache.clear()
+    token_states.clear()
+    login_failures.clear()
+    tag_index.invalidate()
     with app.app_context():
         db.create_all()
 
@@ -28,6 +34,23 @@ def db_create():
         db.drop_all()
 
 
+@pytest.fixture()
+def sql_statements(db_create):
+    """
+    Список SQL-запросов, выполненных во время теста
+    """
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.get_engine()
+    event.listen(engine, "before_cursor_execute", on_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", on_execute)
+
+
 @pytest.fixture()
 def create_test_user1(db_create):
     user1_data = {
@@ -207,6 +230,14 @@ def auth_headers(create_test_user1):
     }
 
 
+@pytest.fixture()
+def token_headers(client, auth_headers):
+    token = client.get("/auth/token", headers=auth_headers).get_json()["token"]
+    return {
+        'Authorization': 'Basic ' + b64encode(f"{token}:".encode('ascii')).decode('utf-8')
+    }
+
+
 @pytest.fixture()
 def user_data():
     user_data = {
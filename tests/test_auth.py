@@ -0,0 +1,216 @@
+import json
+from base64 import b64encode
+from sqlalchemy import event
+from api import db, credential_cache, token_states, password_hasher, login_failures
+from api.models.user import UserModel
+from config import Config, password_context
+from app import app
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+class TestAuth:
+
+    def test_credential_cache_hit(self, client, create_test_note1_by_user1, auth_headers):
+        """
+        Тест повторной аутентификации, пароль проверяется по кэшу
+        :param client: клиент flask
+        :param create_test_note1_by_user1: создание пользователя и заметки
+        :param auth_headers: аутентификация
+        """
+        client.get("/notes", headers=auth_headers)
+        res = client.get("/notes", headers=auth_headers)
+        assert res.status_code == 200
+        assert credential_cache.stats()["hits"] == 1
+        assert credential_cache.stats()["misses"] == 1
+
+    def test_credential_cache_wrong_password(self, client, create_test_user1, auth_headers):
+        """
+        Тест аутентификации с неверным паролем после успешной
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        client.get("/notes", headers=auth_headers)
+        res = client.get("/notes", headers={'Authorization': 'Basic dXNlcjE6d3Jvbmc='})
+        assert res.status_code == 401
+        assert credential_cache.stats()["hits"] == 0
+
+    def test_credential_cache_invalidated_on_rename(self, client, create_test_user1, auth_headers):
+        """
+        Тест сброса кэша при изменении имени пользователя
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        client.get("/notes", headers=auth_headers)
+        assert credential_cache.stats()["size"] == 1
+        client.put(f"/users/{create_test_user1[0].id}", data=json.dumps({"username": "user3"}),
+                   content_type="application/json")
+        assert credential_cache.stats()["size"] == 0
+        res = client.get("/notes", headers=auth_headers)
+        assert res.status_code == 401
+
+    def test_principal_query_loads_no_relationships(self, create_test_note1_by_user1):
+        """
+        Тест загрузки пользователя для аутентификации без заметок и тегов
+        :param create_test_note1_by_user1: создание пользователя и заметки
+        """
+        db.session.remove()
+        user = UserModel.principal_query().filter_by(username="user1").first()
+        assert "notes" not in user.__dict__
+        assert "tags" not in user.__dict__
+        assert len(user.notes) == 1
+
+    def test_token_auth_without_sql(self, client, create_test_user1, auth_headers):
+        """
+        Тест аутентификации по токену без запросов к БД
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        token = client.get("/auth/token", headers=auth_headers).get_json()["token"]
+        assert UserModel.verify_auth_token(token).username == "user1"
+        statements = []
+        engine = db.get_engine()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        user = UserModel.verify_auth_token(token)
+        event.remove(engine, "before_cursor_execute", listener)
+        assert user.id == create_test_user1[0].id
+        assert statements == []
+        assert token_states.stats()["hits"] == 1
+
+    def test_token_revoked_on_rename(self, client, create_test_user1, token_headers):
+        """
+        Тест отзыва токенов при изменении имени пользователя
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param token_headers: аутентификация по токену
+        """
+        res = client.get("/notes", headers=token_headers)
+        assert res.status_code == 404
+        client.put(f"/users/{create_test_user1[0].id}", data=json.dumps({"username": "user3"}),
+                   content_type="application/json")
+        res = client.get("/notes", headers=token_headers)
+        assert res.status_code == 401
+
+    def test_token_revoked_on_delete(self, client, create_test_user1, token_headers):
+        """
+        Тест отзыва токенов при удалении пользователя
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param token_headers: аутентификация по токену
+        """
+        client.get("/notes", headers=token_headers)
+        client.delete(f"/users/{create_test_user1[0].id}")
+        res = client.get("/notes", headers=token_headers)
+        assert res.status_code == 401
+
+    def test_refresh_token(self, client, create_test_user1, auth_headers):
+        """
+        Тест обмена токена обновления на токен доступа
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        refresh_token = client.get("/auth/token", headers=auth_headers).get_json()["refresh_token"]
+        res = client.post("/auth/refresh", data=json.dumps({"refresh_token": refresh_token}),
+                          content_type="application/json")
+        assert res.status_code == 200
+        token = res.get_json()["token"]
+        assert UserModel.verify_auth_token(token).id == create_test_user1[0].id
+        assert UserModel.verify_auth_token(refresh_token) is None
+
+    def test_refresh_token_requires_password(self, client, create_test_user1, token_headers):
+        """
+        Тест: по токену доступа выдается только новый токен доступа, без токена обновления
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param token_headers: аутентификация по токену
+        """
+        res = client.get("/auth/token", headers=token_headers)
+        assert res.status_code == 200
+        assert list(res.get_json()) == ["token"]
+
+    def test_refresh_token_revoked(self, client, create_test_user1, auth_headers):
+        """
+        Тест отзыва токенов пользователя
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        refresh_token = client.get("/auth/token", headers=auth_headers).get_json()["refresh_token"]
+        res = client.delete("/auth/refresh", headers=auth_headers)
+        assert res.status_code == 200
+        res = client.post("/auth/refresh", data=json.dumps({"refresh_token": refresh_token}),
+                          content_type="application/json")
+        assert res.status_code == 401
+        data = json.loads(res.data)
+        assert data["error"] == "Invalid or expired refresh token"
+
+    def test_rehash_outdated_password_hash(self, client, create_test_user1, auth_headers):
+        """
+        Тест перехэширования пароля, захэшированного устаревшей схемой
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        user = create_test_user1[0]
+        user.password_hash = password_context("sha256_crypt", 1000).hash(create_test_user1[1]["password"])
+        user.save()
+        res = client.get("/notes", headers=auth_headers)
+        assert res.status_code == 404
+        user = UserModel.query.get(user.id)
+        assert Config.PWD_CONTEXT.identify(user.password_hash) == Config.PASSWORD_HASH_SCHEME
+        assert not Config.PWD_CONTEXT.needs_update(user.password_hash)
+
+    def test_password_hasher_pool(self):
+        """
+        Тест хэширования и проверки пароля в пуле процессов
+        """
+        password_hasher.set_pool_size(1)
+        try:
+            password_hash = password_hasher.hash("user1")
+            assert password_hasher.verify_and_update("user1", password_hash) == (True, None)
+            assert password_hasher.verify_and_update("user2", password_hash) == (False, None)
+        finally:
+            password_hasher.set_pool_size(0)
+
+    def test_repeated_login_failures_rejected(self, client, create_test_user1, auth_headers):
+        """
+        Тест отклонения повторных неудачных входов без запросов к БД
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        wrong_headers = {'Authorization': 'Basic ' + b64encode(b"user1:wrong").decode('utf-8')}
+        for _ in range(Config.LOGIN_FAILURE_LIMIT):
+            assert client.get("/notes", headers=wrong_headers).status_code == 401
+        statements = []
+        engine = db.get_engine()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        res = client.get("/notes", headers=auth_headers)
+        event.remove(engine, "before_cursor_execute", listener)
+        assert res.status_code == 401
+        assert statements == []
+        assert login_failures.stats() == {"failures": Config.LOGIN_FAILURE_LIMIT, "rejected": 1, "size": 1}
+
+    def test_login_failures_per_client_behind_proxy(self, client, create_test_user1, auth_headers, monkeypatch):
+        """
+        Тест: за прокси неудачные входы считаются по адресу клиента из X-Forwarded-For,
+        чужие неудачные попытки не блокируют вход с другого адреса
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        :param monkeypatch: подключение ProxyFix
+        """
+        monkeypatch.setattr(app, "wsgi_app", ProxyFix(app.wsgi_app, x_for=1))
+        wrong_headers = {'Authorization': 'Basic ' + b64encode(b"user1:wrong").decode('utf-8')}
+        for _ in range(Config.LOGIN_FAILURE_LIMIT):
+            res = client.get("/notes", headers={**wrong_headers, "X-Forwarded-For": "203.0.113.1"})
+            assert res.status_code == 401
+        res = client.get("/notes", headers={**auth_headers, "X-Forwarded-For": "203.0.113.1"})
+        assert res.status_code == 401
+        res = client.get("/notes", headers={**auth_headers, "X-Forwarded-For": "198.51.100.2"})
+        assert res.status_code != 401
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+from sqlalchemy import event
+from api import db
+from api.models.note import NoteModel, tags
+from api.models.tag import TagModel
+
+
+def query_plans(func):
+    """
+    Выполняет функцию и возвращает планы выполнения SQLite для всех ее запросов
+    :param func: функция, выполняющая запросы
+    :return: список планов, план - список шагов
+    """
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.get_engine()
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    connection = engine.raw_connection()
+    try:
+        return [[row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                for statement, parameters in statements]
+    finally:
+        connection.close()
+
+
+def assert_uses_index(func, index_name):
+    """
+    Проверяет, что запрос использует индекс и не просматривает таблицы целиком
+    :param func: функция, выполняющая запрос
+    :param index_name: имя индекса
+    """
+    plan, = query_plans(func)
+    assert any(index_name in step for step in plan), plan
+    assert not any(step.startswith("SCAN") for step in plan), plan
+
+
+class TestIndexes:
+
+    author = SimpleNamespace(id=1)
+
+    def test_all_notes_query_uses_index(self, db_create):
+        """
+        Тест использования индекса при выборке всех заметок пользователя
+        :param db_create: создание БД
+        """
+        assert_uses_index(lambda: NoteModel.get_all_notes(self.author, "all", limit=10),
+                          "ix_note_model_author_id_date")
+
+    def test_archive_notes_query_uses_index(self, db_create):
+        """
+        Тест использования индекса при выборке архивных заметок пользователя
+        :param db_create: создание БД
+        """
+        assert_uses_index(lambda: NoteModel.get_all_notes(self.author, "archive", limit=10),
+                          "ix_note_model_author_id_archive_date")
+
+    def test_public_notes_query_uses_index(self, db_create):
+        """
+        Тест использования индекса при выборке ленты публичных заметок
+        :param db_create: создание БД
+        """
+        assert_uses_index(lambda: NoteModel.get_all_public_notes(limit=10),
+                          "ix_note_model_private_archive_date")
+
+    def test_notes_filtered_by_tags_query_uses_index(self, db_create):
+        """
+        Тест использования индексов при фильтрации заметок по тегу
+        :param db_create: создание БД
+        """
+        assert_uses_index(lambda: NoteModel.get_notes_filtered_by_tags(["tag 1", "tag 2"], match="all", limit=10),
+                          "sqlite_autoindex_tag_1")
+
+    def test_note_tags_query_uses_index(self, db_create):
+        """
+        Тест использования индекса при загрузке тегов заметок
+        :param db_create: создание БД
+        """
+        assert_uses_index(lambda: TagModel.query.join(tags).filter(tags.c.note_model_id == 1).all(),
+                          "ix_tags_note_model_id")
+
+    def test_tags_query_uses_index(self, db_create):
+        """
+        Тест использования индекса при выборке тегов пользователя
+        :param db_create: создание БД
+        """
+        assert_uses_index(lambda: TagModel.query.filter_by(author_id=1).all(), "ix_tag_author_id")
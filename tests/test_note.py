@@ -1,4 +1,14 @@
 import json
+import pytest
+from base64 import b64encode, urlsafe_b64encode
+from config import Config
+from api.tag_index import to_bitmap, iter_bits
+from api import search, db
+from api.models.note import NoteModel, tags
+from api.models.version import VersionModel
+from app import app
+from datetime import datetime
+from sqlalchemy.orm import Query
 
 
 class TestNotes:
@@ -53,6 +63,78 @@ class TestNotes:
         data = json.loads(res.data)
         assert len(data) == 2
 
+    def test_get_notes_paginated(self, client, create_test_note1_and_note2_by_user1, auth_headers):
+        """
+        Тест постраничного получения заметок пользователя
+        :param client: клиент flask
+        :param create_test_note1_and_note2_by_user1: создание пользователя и 2 заметок
+        :param auth_headers: аутентификация
+        """
+        res = client.get("/notes?limit=1", headers=auth_headers)
+        assert res.status_code == 200
+        data = json.loads(res.data)
+        assert [note["id"] for note in data] == [create_test_note1_and_note2_by_user1[0].id]
+        cursor = res.headers["X-Next-Cursor"]
+        res = client.get(f"/notes?limit=1&cursor={cursor}", headers=auth_headers)
+        assert res.status_code == 200
+        data = json.loads(res.data)
+        assert [note["id"] for note in data] == [create_test_note1_and_note2_by_user1[1].id]
+        assert "X-Next-Cursor" not in res.headers
+
+    def test_get_notes_streamed(self, client, create_test_note1_and_note2_by_user1, auth_headers):
+        """
+        Тест потоковой выдачи заметок: тот же JSON, что и без потоковой выдачи
+        :param client: клиент flask
+        :param create_test_note1_and_note2_by_user1: Создание пользователя и заметок
+        :param auth_headers: аутентификация
+        """
+        expected = json.loads(client.get("/notes", headers=auth_headers).data)
+        res = client.get("/notes?stream=true", headers=auth_headers)
+        assert res.status_code == 200
+        assert res.is_streamed
+        assert json.loads(res.data) == expected
+        cursor = client.get("/notes?limit=1", headers=auth_headers).headers["X-Next-Cursor"]
+        res = client.get(f"/notes?stream=true&cursor={cursor}", headers=auth_headers)
+        assert json.loads(res.data) == expected[1:]
+        assert client.get("/notes/archive?stream=true", headers=auth_headers).status_code == 404
+        assert client.get("/notes?stream=true&limit=1", headers=auth_headers).status_code == 422
+
+    def test_get_notes_sparse_fields(self, client, create_test_user1_note1_tag1_tag2, tags_set_data, token_headers,
+                                     sql_statements):
+        """
+        Тест выборочных полей: в ответе только запрошенные поля, незапрошенные связи не загружаются
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param tags_set_data: список тегов
+        :param token_headers: аутентификация по токену
+        :param sql_statements: выполненные SQL-запросы
+        """
+        client.put("/notes/1/tags/set", headers=token_headers,
+                   data=json.dumps(tags_set_data), content_type="application/json")
+        sql_statements.clear()
+        res = client.get("/notes?fields=id,note", headers=token_headers)
+        assert res.status_code == 200
+        assert json.loads(res.data) == [{"id": 1, "note": "test note 1"}]
+        assert not any("FROM tag" in statement or "FROM user_model" in statement for statement in sql_statements)
+
+        res = client.get("/notes?fields=id,tags.name", headers=token_headers)
+        assert json.loads(res.data) == [{"id": 1, "tags": [{"name": "test tag 1"}, {"name": "test tag 2"}]}]
+        res = client.get("/tags?fields=name", headers=token_headers)
+        assert json.loads(res.data) == [{"name": "test tag 1"}, {"name": "test tag 2"}]
+        assert client.get("/notes?fields=id,secret", headers=token_headers).status_code == 400
+
+    def test_get_notes_invalid_cursor(self, client, create_test_note1_by_user1, auth_headers):
+        """
+        Тест постраничного получения заметок с неверным курсором
+        :param client: клиент flask
+        :param create_test_note1_by_user1: создание пользователя и заметки
+        :param auth_headers: аутентификация
+        """
+        res = client.get("/notes?limit=1&cursor=wrong", headers=auth_headers)
+        assert res.status_code == 400
+        data = json.loads(res.data)
+        assert data["error"] == "Invalid cursor"
+
     def test_get_notes_not_found(self, client, create_test_user1, auth_headers):
         """
         Тест получения всех заметок полязователя, заметки не найдены
@@ -177,6 +259,42 @@ class TestNotes:
         assert data["tags"][0]["name"] == create_test_user1_note1_tag1_tag2[1][0].name
         assert data["tags"][1]["name"] == create_test_user1_note1_tag1_tag2[1][1].name
 
+    def test_put_tag_set_to_note_already_attached(self, client, create_test_user1_note1_tag1_tag2, auth_headers):
+        """
+        Тест повторной привязки тега к заметке: привязанный тег пропускается
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param auth_headers: аутентификация
+        """
+        url = f"/notes/{create_test_user1_note1_tag1_tag2[0].id}/tags/set"
+        client.put(url, headers=auth_headers, data=json.dumps({"tags": [1]}), content_type="application/json")
+        res = client.put(url, headers=auth_headers, data=json.dumps({"tags": [1, 2, 2]}),
+                         content_type="application/json")
+        assert res.status_code == 200
+        assert [tag["id"] for tag in json.loads(res.data)["tags"]] == [1, 2]
+
+    def test_put_tag_set_to_note_concurrent(self, client, create_test_user1_note1_tag1_tag2, auth_headers,
+                                            monkeypatch):
+        """
+        Тест привязки тега, который параллельный запрос привязал к заметке перед вставкой
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param auth_headers: аутентификация
+        :param monkeypatch: подмена привязки тегов
+        """
+        attach_tags = NoteModel.attach_tags
+
+        def attach_after_concurrent(note, tag_ids):
+            db.engine.execute(tags.insert(), {"tag_id": 1, "note_model_id": note.id})
+            monkeypatch.setattr(NoteModel, "attach_tags", attach_tags)
+            return attach_tags(note, tag_ids)
+
+        monkeypatch.setattr(NoteModel, "attach_tags", attach_after_concurrent)
+        res = client.put(f"/notes/{create_test_user1_note1_tag1_tag2[0].id}/tags/set", headers=auth_headers,
+                         data=json.dumps({"tags": [1, 2]}), content_type="application/json")
+        assert res.status_code == 200
+        assert [tag["id"] for tag in json.loads(res.data)["tags"]] == [1, 2]
+
     def test_put_tag_set_to_note_note_not_found(self, client, create_test_user1_note1_tag1_tag2,
                                                 tags_set_data, auth_headers):
         """
@@ -303,10 +421,122 @@ class TestNotes:
         """
         client.put(f"/notes/{create_test_user1_note1_tag1_tag2[0].id}/tags/set", headers=auth_headers,
                    data=json.dumps(tags_set_data), content_type="application/json")
-        res = client.get("/notes/filter?tags=test tag 1&tags=test tag 3")
+        res = client.get("/notes/filter?tags=test tag 1&tags=test tag 3&match=all")
         assert res.status_code == 404
         data = json.loads(res.data)
-        assert data["error"] == "Note with tag_name=test tag 3 not found"
+        assert data["error"] == "Notes with such tags not found"
+
+    def test_get_note_by_any_tag(self, client, create_test_user1_note1_tag1_tag2, auth_headers):
+        """
+        Тест получения заметок хотя бы с одним из тегов, часть тегов не найдена
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param auth_headers: аутентификация
+        """
+        client.put(f"/notes/{create_test_user1_note1_tag1_tag2[0].id}/tags/set", headers=auth_headers,
+                   data=json.dumps({"tags": [1]}), content_type="application/json")
+        res = client.get("/notes/filter?tags=test tag 1&tags=test tag 2&tags=test tag 3")
+        assert res.status_code == 200
+        data = json.loads(res.data)
+        assert len(data) == 1
+        assert data[0]["note"] == "test note 1"
+        res = client.get("/notes/filter?tags=test tag 1&tags=test tag 2&match=all")
+        assert res.status_code == 404
+
+    @pytest.mark.parametrize("tag_index_enabled", [False, True])
+    def test_get_note_by_tags_and_or_not(self, client, create_test_user1_note1_tag1_tag2, auth_headers,
+                                         monkeypatch, tag_index_enabled):
+        """
+        Тест фильтрации заметок по тегам с режимами any/all и исключением тегов,
+        запросом к БД и через индекс тегов в памяти
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param auth_headers: аутентификация
+        :param monkeypatch: изменение настроек
+        :param tag_index_enabled: использовать индекс тегов в памяти
+        """
+        monkeypatch.setattr(Config, "TAG_INDEX_ENABLED", tag_index_enabled)
+        note_id = create_test_user1_note1_tag1_tag2[0].id
+        client.post("/notes", headers=auth_headers, data=json.dumps({"note": "test note 2"}),
+                    content_type="application/json")
+        client.get("/notes/filter?tags=test tag 1")  # индекс строится до изменений тегов
+        client.put(f"/notes/{note_id}/tags/set", headers=auth_headers,
+                   data=json.dumps({"tags": [1, 2]}), content_type="application/json")
+        client.put("/notes/2/tags/set", headers=auth_headers,
+                   data=json.dumps({"tags": [1]}), content_type="application/json")
+
+        def filtered(query):
+            res = client.get(f"/notes/filter?{query}")
+            return [note["id"] for note in json.loads(res.data)] if res.status_code == 200 else []
+
+        assert filtered("tags=test tag 1&tags=test tag 2") == [note_id, 2]
+        assert filtered("tags=test tag 1&tags=test tag 2&match=all") == [note_id]
+        assert filtered("tags=test tag 1&exclude=test tag 2") == [2]
+        res = client.get("/notes/filter?tags=test tag 1&limit=1")
+        assert [note["id"] for note in json.loads(res.data)] == [note_id]
+        assert filtered(f"tags=test tag 1&limit=1&cursor={res.headers['X-Next-Cursor']}") == [2]
+        client.put("/notes/2/to_archive", headers=auth_headers)
+        assert filtered("tags=test tag 1") == [note_id]
+        client.put(f"/notes/{note_id}/tags/remove", headers=auth_headers,
+                   data=json.dumps({"tags": [1]}), content_type="application/json")
+        assert filtered("tags=test tag 1") == []
+        assert filtered("tags=test tag 2") == [note_id]
+
+    def test_tag_index_deleted_note_id_reused(self, client, create_test_user1_note1_tag1_tag2, auth_headers,
+                                              monkeypatch):
+        """
+        Тест индекса тегов: удаленная заметка исключается из выдачи, а заметка, получившая ее id,
+        не наследует ее теги
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param auth_headers: аутентификация
+        :param monkeypatch: изменение настроек
+        """
+        monkeypatch.setattr(Config, "TAG_INDEX_ENABLED", True)
+        client.post("/notes", headers=auth_headers, data=json.dumps({"note": "test note 2"}),
+                    content_type="application/json")
+        client.put("/notes/2/tags/set", headers=auth_headers,
+                   data=json.dumps({"tags": [1]}), content_type="application/json")
+        assert [note["id"] for note in json.loads(client.get("/notes/filter?tags=test tag 1").data)] == [2]
+        client.delete("/notes/2", headers=auth_headers)
+        assert client.get("/notes/filter?tags=test tag 1").status_code == 404
+        res = client.post("/notes", headers=auth_headers, data=json.dumps({"note": "test note 3"}),
+                          content_type="application/json")
+        assert json.loads(res.data)["id"] == 2
+        client.put("/notes/2/tags/set", headers=auth_headers,
+                   data=json.dumps({"tags": [2]}), content_type="application/json")
+        assert client.get("/notes/filter?tags=test tag 1").status_code == 404
+        assert [note["id"] for note in json.loads(client.get("/notes/filter?tags=test tag 2").data)] == [2]
+
+    @pytest.mark.parametrize("tag_index_enabled", [False, True])
+    @pytest.mark.parametrize("value", ['["x"]', '[null]', '[1.5]', '[-5]', '[true]', '[1, 2]', '{}'])
+    def test_get_note_by_tags_invalid_cursor(self, client, create_test_user1_note1_tag1_tag2, monkeypatch,
+                                             tag_index_enabled, value):
+        """
+        Тест фильтрации заметок по тегам с неверным курсором
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param monkeypatch: изменение настроек
+        :param tag_index_enabled: использовать индекс тегов в памяти
+        :param value: содержимое курсора
+        """
+        monkeypatch.setattr(Config, "TAG_INDEX_ENABLED", tag_index_enabled)
+        cursor = urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+        res = client.get(f"/notes/filter?tags=test tag 1&limit=1&cursor={cursor}")
+        if value == "[-5]" and not tag_index_enabled:
+            assert res.status_code in (200, 404)  # в запросе SQL отрицательное значение ключа допустимо
+            return
+        assert res.status_code == 400
+        assert json.loads(res.data)["error"] == "Invalid cursor"
+
+    def test_tag_index_bitmap(self):
+        """
+        Тест построения битовой маски из разреженных id
+        """
+        ids = [0, 7, 8, 4095, 5000000]
+        assert to_bitmap(ids) == sum(1 << note_id for note_id in ids)
+        assert list(iter_bits(to_bitmap(ids), -1)) == ids
+        assert to_bitmap([]) == 0
 
     def test_get_all_public_notes(self, client, create_test_note1_and_note2_by_user1, note_private_data,
                                   auth_headers):
@@ -324,8 +554,29 @@ class TestNotes:
         res = client.get("/notes/public")
         assert res.status_code == 200
         data = json.loads(res.data)
-        assert data[0]["note"] == create_test_note1_and_note2_by_user1[0].note
-        assert data[1]["note"] == "test note 2"
+        assert data[0]["note"] == "test note 2"
+        assert data[1]["note"] == create_test_note1_and_note2_by_user1[0].note
+
+    def test_get_public_notes_paginated(self, client, create_test_note1_and_note2_by_user1, note_private_data,
+                                        auth_headers):
+        """
+        Тест постраничного получения ленты публичных заметок
+        :param client: клиент flask
+        :param create_test_note1_and_note2_by_user1: Создание пользователя и заметок
+        :param note_private_data: параметры для изменения флага
+        :param auth_headers: аутентификация
+        """
+        for note_id in [note.id for note in create_test_note1_and_note2_by_user1]:
+            client.put(f"/notes/{note_id}", headers=auth_headers,
+                       data=json.dumps(note_private_data), content_type="application/json")
+        res = client.get("/notes/public?limit=1")
+        assert res.status_code == 200
+        assert [note["note"] for note in json.loads(res.data)] == ["test note 2"]
+        res = client.get(f"/notes/public?limit=1&cursor={res.headers['X-Next-Cursor']}")
+        assert [note["note"] for note in json.loads(res.data)] == ["test note 1"]
+        assert "X-Next-Cursor" not in res.headers
+        res = client.get("/notes/public?limit=1000")
+        assert res.status_code == 422
 
     def test_get_all_public_notes_not_found(self, client, create_test_note1_and_note2_by_user1):
         """
@@ -467,3 +718,290 @@ class TestNotes:
         assert res.status_code == 403
         data = json.loads(res.data)
         assert data["error"] == "Access denied to note with id=2"
+
+    def test_search_notes(self, client, create_test_user1, auth_headers, note_private_data):
+        """
+        Тест полнотекстового поиска: частные заметки видны только автору, архивные не возвращаются,
+        индекс обновляется при изменении и удалении заметки
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        :param note_private_data: параметры для изменения флага
+        """
+        def post(text):
+            res = client.post("/notes", headers=auth_headers,
+                              data=json.dumps({"note": text}), content_type="application/json")
+            return res.get_json()["id"]
+
+        def search(q, headers=None):
+            res = client.get(f"/notes/search?q={q}", headers=headers)
+            return [note["id"] for note in res.get_json()] if res.status_code == 200 else res.status_code
+
+        private_id = post("coffee in the morning")
+        public_id = post("coffee coffee and tea")
+        archived_id = post("coffee beans")
+        client.put(f"/notes/{public_id}", headers=auth_headers,
+                   data=json.dumps(note_private_data), content_type="application/json")
+        client.put(f"/notes/{archived_id}/to_archive", headers=auth_headers)
+
+        assert search("coffee", auth_headers) == [public_id, private_id]
+        assert search("coffee") == [public_id]
+        assert search("morning coffee", auth_headers) == [private_id]
+        assert search("tea OR") == 404
+
+        client.put(f"/notes/{private_id}", headers=auth_headers,
+                   data=json.dumps({"note": "green tea"}), content_type="application/json")
+        assert search("morning", auth_headers) == 404
+        assert sorted(search("tea", auth_headers)) == [private_id, public_id]
+
+        client.delete(f"/notes/{public_id}", headers=auth_headers)
+        assert search("tea", auth_headers) == [private_id]
+
+    def test_search_notes_paginated(self, client, create_test_user1, auth_headers):
+        """
+        Тест постраничной выдачи результатов поиска
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        """
+        for text in ["apple", "apple pie", "apple juice"]:
+            client.post("/notes", headers=auth_headers,
+                        data=json.dumps({"note": text}), content_type="application/json")
+        res = client.get("/notes/search?q=apple&limit=2", headers=auth_headers)
+        assert res.status_code == 200
+        first_page = [note["id"] for note in res.get_json()]
+        res = client.get(f"/notes/search?q=apple&limit=2&cursor={res.headers['X-Next-Cursor']}",
+                         headers=auth_headers)
+        second_page = [note["id"] for note in res.get_json()]
+        assert sorted(first_page + second_page) == [1, 2, 3]
+        assert "X-Next-Cursor" not in res.headers
+        assert client.get("/notes/search?q=", headers=auth_headers).status_code == 422
+        assert client.get("/notes/search?q=%20%09", headers=auth_headers).status_code == 422
+        assert search.search_notes(" ") == ([], None)
+        res = client.get('/notes/search?q="', headers=auth_headers)
+        assert res.status_code in (200, 404)
+
+    def test_search_index_failure(self, client, create_test_user1, auth_headers, monkeypatch):
+        """
+        Тест: при ошибке записи в поисковый индекс заметка не создается и не изменяется
+        :param client: клиент flask
+        :param create_test_user1: создание пользователя
+        :param auth_headers: аутентификация
+        :param monkeypatch: подмена записи в индекс
+        """
+        client.post("/notes", headers=auth_headers,
+                    data=json.dumps({"note": "apple"}), content_type="application/json")
+
+        def fail(notes, commit=True):
+            raise RuntimeError("index is unavailable")
+
+        monkeypatch.setattr(search, "index_notes", fail)
+        res = client.post("/notes", headers=auth_headers,
+                          data=json.dumps({"note": "pear"}), content_type="application/json")
+        assert res.status_code == 400
+        res = client.put("/notes/1", headers=auth_headers,
+                         data=json.dumps({"note": "plum"}), content_type="application/json")
+        assert res.status_code == 404
+        monkeypatch.undo()
+        assert [note["note"] for note in client.get("/notes", headers=auth_headers).get_json()] == ["apple"]
+        assert client.get("/notes/search?q=apple", headers=auth_headers).status_code == 200
+
+    def test_get_public_notes_not_modified(self, client, create_test_note1_and_note2_by_user1, note_private_data,
+                                           auth_headers):
+        """
+        Тест условного запроса ленты публичных заметок: 304 пока лента не изменилась
+        :param client: клиент flask
+        :param create_test_note1_and_note2_by_user1: Создание пользователя и заметок
+        :param note_private_data: параметры для изменения флага
+        :param auth_headers: аутентификация
+        """
+        note_ids = [note.id for note in create_test_note1_and_note2_by_user1]
+        client.put(f"/notes/{note_ids[0]}", headers=auth_headers,
+                   data=json.dumps(note_private_data), content_type="application/json")
+        res = client.get("/notes/public")
+        assert res.status_code == 200
+        etag = res.headers["ETag"]
+        assert "Last-Modified" in res.headers
+        res = client.get("/notes/public", headers={"If-None-Match": etag})
+        assert res.status_code == 304
+        assert res.data == b""
+        assert client.get("/notes/public?limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+        client.put(f"/notes/{note_ids[1]}", headers=auth_headers,
+                   data=json.dumps({"note": "private text"}), content_type="application/json")
+        assert client.get("/notes/public", headers={"If-None-Match": etag}).status_code == 304
+
+        client.put(f"/notes/{note_ids[0]}/to_archive", headers=auth_headers)
+        res = client.get("/notes/public", headers={"If-None-Match": etag})
+        assert res.status_code == 404
+        client.put(f"/notes/{note_ids[0]}/restore", headers=auth_headers)
+        res = client.get("/notes/public", headers={"If-None-Match": etag})
+        assert res.status_code == 200
+        assert res.headers["ETag"] != etag
+
+    def test_get_notes_not_modified(self, client, create_test_note1_and_note2_by_user1, create_test_user2,
+                                    auth_headers):
+        """
+        Тест условного запроса заметок пользователя: 304 пока заметки пользователя не изменились
+        :param client: клиент flask
+        :param create_test_note1_and_note2_by_user1: Создание пользователя и заметок
+        :param create_test_user2: создание второго пользователя
+        :param auth_headers: аутентификация
+        """
+        note_id = create_test_note1_and_note2_by_user1[0].id
+        user2_headers = {'Authorization': 'Basic ' + b64encode(b"user2:user2").decode('utf-8')}
+        etag = client.get("/notes", headers=auth_headers).headers["ETag"]
+        assert etag.startswith("W/")
+        res = client.get("/notes", headers={**auth_headers, "If-None-Match": etag})
+        assert res.status_code == 304
+
+        client.post("/notes", headers=user2_headers,
+                    data=json.dumps({"note": "note of user 2"}), content_type="application/json")
+        res = client.get("/notes", headers={**auth_headers, "If-None-Match": etag})
+        assert res.status_code == 304
+
+        client.put(f"/notes/{note_id}/to_archive", headers=auth_headers)
+        res = client.get("/notes", headers={**auth_headers, "If-None-Match": etag})
+        assert res.status_code == 200
+        res = client.get("/notes/archive", headers=auth_headers)
+        archive_etag = res.headers["ETag"]
+        assert [note["id"] for note in json.loads(res.data)] == [note_id]
+        client.put(f"/notes/{note_id}/restore", headers=auth_headers)
+        res = client.get("/notes/archive", headers={**auth_headers, "If-None-Match": archive_etag})
+        assert res.status_code == 404
+
+    def test_version_bump_concurrent_insert(self, db_create, monkeypatch):
+        """
+        Тест увеличения версии новой коллекции, строку которой одновременно добавил другой запрос:
+        вставка откатывается до точки сохранения, версия увеличивается повторным UPDATE
+        :param db_create: создание БД
+        :param monkeypatch: подмена UPDATE
+        """
+        with app.app_context():
+            assert VersionModel.get(VersionModel.PUBLIC_FEED)[0] == 0
+            db.session.execute(VersionModel.__table__.insert(),
+                               {"scope": "user:1", "version": 5, "modified": datetime.utcnow()})
+            update = Query.update
+
+            def update_before_concurrent_insert(query, *args, **kwargs):
+                monkeypatch.setattr(Query, "update", update)
+                return 0
+
+            monkeypatch.setattr(Query, "update", update_before_concurrent_insert)
+            VersionModel.bump_user(1)
+            db.session.commit()
+            assert VersionModel.get("user:1")[0] == 6
+
+    def test_post_create_notes_batch(self, client, create_test_user1_note1_tag1_tag2, auth_headers):
+        """
+        Тест пакетного создания заметок с привязкой тегов и ошибками отдельных заметок
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и тегов
+        :param auth_headers: аутентификация
+        """
+        batch = {"notes": [{"note": "batch note 1"}, {"private": False}, {"note": "batch note 2", "private": False},
+                           {"note": 1}, "str", 5, None, ["note"]],
+                 "tags": [1, 2]}
+        res = client.post("/notes/batch", headers=auth_headers,
+                          data=json.dumps(batch), content_type="application/json")
+        assert res.status_code == 201
+        data = json.loads(res.data)
+        assert len(data["created"]) == 2
+        assert set(data["errors"]) == {"1", "3", "4", "5", "6", "7"}
+        assert data["errors"]["4"] == {"_schema": ["Invalid input type."]}
+        for note_id in data["created"]:
+            note = json.loads(client.get(f"/notes/{note_id}", headers=auth_headers).data)
+            assert sorted(tag["id"] for tag in note["tags"]) == [1, 2]
+        assert [note["note"] for note in json.loads(client.get("/notes/public").data)] == ["batch note 2"]
+        assert json.loads(client.get("/notes/search?q=batch", headers=auth_headers).data)
+
+        res = client.post("/notes/batch", headers=auth_headers,
+                          data=json.dumps({"notes": [{"note": "note"}], "tags": [3]}),
+                          content_type="application/json")
+        assert res.status_code == 404
+        res = client.post("/notes/batch", headers=auth_headers,
+                          data=json.dumps({"notes": [{}]}), content_type="application/json")
+        assert res.status_code == 422
+
+    def test_put_notes_to_archive_and_restore_in_batch(self, client, create_test_note1_and_note2_by_user1,
+                                                       create_test_note2_by_user2, auth_headers):
+        """
+        Тест пакетного переноса заметок в архив и восстановления из архива
+        :param client: клиент flask
+        :param create_test_note1_and_note2_by_user1: Создание пользователя и заметок
+        :param create_test_note2_by_user2: создание пользователя и заметки
+        :param auth_headers: аутентификация
+        """
+        own_ids = [note.id for note in create_test_note1_and_note2_by_user1]
+        other_id = create_test_note2_by_user2[0].id
+        client.put(f"/notes/{own_ids[1]}/to_archive", headers=auth_headers)
+        res = client.put("/notes/to_archive", headers=auth_headers,
+                         data=json.dumps({"ids": own_ids + [other_id, 100]}), content_type="application/json")
+        assert res.status_code == 200
+        assert json.loads(res.data) == {"changed": [own_ids[0]], "skipped": [own_ids[1], 100],
+                                        "forbidden": [other_id]}
+        archive = json.loads(client.get("/notes/archive", headers=auth_headers).data)
+        assert sorted(note["id"] for note in archive) == own_ids
+        res = client.put("/notes/restore", headers=auth_headers,
+                         data=json.dumps({"ids": own_ids}), content_type="application/json")
+        assert json.loads(res.data)["changed"] == own_ids
+        assert client.get("/notes/archive", headers=auth_headers).status_code == 404
+
+    def test_delete_notes_in_batch(self, client, create_test_user1_note1_tag1_tag2, create_test_note2_by_user2,
+                                   tags_set_data, auth_headers):
+        """
+        Тест пакетного удаления заметок
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и тегов
+        :param create_test_note2_by_user2: создание пользователя и заметки
+        :param tags_set_data: id тегов
+        :param auth_headers: аутентификация
+        """
+        note_id = create_test_user1_note1_tag1_tag2[0].id
+        other_id = create_test_note2_by_user2[0].id
+        client.put(f"/notes/{note_id}/tags/set", headers=auth_headers,
+                   data=json.dumps(tags_set_data), content_type="application/json")
+        res = client.delete("/notes/delete", headers=auth_headers,
+                            data=json.dumps({"ids": [note_id, other_id, 100]}), content_type="application/json")
+        assert res.status_code == 200
+        assert json.loads(res.data) == {"changed": [note_id], "skipped": [100], "forbidden": [other_id]}
+        assert client.get(f"/notes/{note_id}", headers=auth_headers).status_code == 404
+        assert client.get("/notes/filter?tags=test tag 1").status_code == 404
+        res = client.delete("/notes/batch", headers=auth_headers,
+                            data=json.dumps({"ids": [other_id]}), content_type="application/json")
+        assert res.status_code == 405
+
+    def test_put_tags_to_notes_in_batch(self, client, create_test_user1_note1_tag1_tag2, create_test_note2_by_user2,
+                                        auth_headers):
+        """
+        Тест пакетной привязки и отвязки тегов по списку id и по фильтру
+        :param client: клиент flask
+        :param create_test_user1_note1_tag1_tag2: создание пользователя, заметки и двух тегов
+        :param create_test_note2_by_user2: создание пользователя и заметки
+        :param auth_headers: аутентификация
+        """
+        note_id = create_test_user1_note1_tag1_tag2[0].id
+        other_id = create_test_note2_by_user2[0].id
+        res = client.post("/notes", headers=auth_headers,
+                          data=json.dumps({"note": "archived note"}), content_type="application/json")
+        archived_id = json.loads(res.data)["id"]
+        client.put(f"/notes/{archived_id}/to_archive", headers=auth_headers)
+
+        def put(url, data):
+            return client.put(url, headers=auth_headers, data=json.dumps(data), content_type="application/json")
+
+        def tag_ids(note_id):
+            return [tag["id"] for tag in json.loads(client.get(f"/notes/{note_id}", headers=auth_headers).data)["tags"]]
+
+        res = put("/notes/tags/set", {"tags": [1], "ids": [note_id, archived_id, other_id]})
+        assert res.status_code == 200
+        assert json.loads(res.data) == {"changed": 2}
+        assert json.loads(put("/notes/tags/set", {"tags": [1, 2], "filter": "no_archive"}).data) == {"changed": 1}
+        assert tag_ids(note_id) == [1, 2]
+        assert tag_ids(archived_id) == [1]
+        assert json.loads(put("/notes/tags/remove", {"tags": [1], "filter": "all"}).data) == {"changed": 2}
+        assert tag_ids(note_id) == [2]
+        assert tag_ids(archived_id) == []
+        assert put("/notes/tags/set", {"tags": [1]}).status_code == 422
+        assert put("/notes/tags/set", {"tags": [1], "ids": [note_id], "filter": "all"}).status_code == 422
+        assert put("/notes/tags/set", {"tags": [3], "ids": [note_id]}).status_code == 404
@@ -0,0 +1,212 @@
+import json
+import pytest
+from datetime import datetime
+from api.models.note import NoteModel
+from api.models.tag import TagModel
+from api.schemas.note import NoteResponseSchema
+from api.schemas.tag import TagResponseSchema
+from api.schemas.user import UserResponseSchema
+from api import search, serializers
+from config import Config
+
+
+@pytest.fixture()
+def create_users_notes_tags(create_test_user1, create_test_user2):
+    """
+    Создание двух пользователей, у каждого - публичные заметки с двумя тегами
+    """
+    users = [create_test_user1[0], create_test_user2[0]]
+    for user in users:
+        tags_lst = [TagModel(author_id=user.id, name=f"{user.username} tag {i}") for i in range(2)]
+        for tag in tags_lst:
+            tag.save()
+        for i in range(5):
+            note = NoteModel(author_id=user.id, note=f"{user.username} note {i}", private=False)
+            note.tags.extend(tags_lst)
+            note.save()
+            search.index_notes([note])
+    return users
+
+
+class TestQueries:
+
+    @pytest.mark.parametrize("url, expected", [
+        ("/notes", 3),
+        ("/notes?limit=2", 3),
+        ("/notes?stream=true", 3),
+        ("/notes/no_archive", 3),
+        ("/notes/public", 3),
+        ("/notes/filter?tags=user1 tag 0&tags=user2 tag 1", 2),
+        ("/notes/search?q=note", 2),
+        ("/tags", 2),
+        ("/notes?fields=", 3),
+        ("/notes?fields=id,%20note,,author", 2),
+        ("/notes/public?fields=", 3),
+        ("/notes/public?fields=id,%20tags.name", 3),
+        ("/notes?stream=true&fields=id,%20note", 2),
+        ("/tags?fields=", 2),
+        ("/tags?fields=id,%20author", 2),
+    ])
+    def test_list_endpoint_statement_count(self, client, create_users_notes_tags, token_headers, sql_statements,
+                                           url, expected):
+        """
+        Тест числа SQL-запросов списков: не зависит от числа заметок, тегов и авторов.
+        Заметки и авторы - один запрос, теги с авторами - один запрос, версия коллекции - один запрос
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        :param token_headers: аутентификация по токену
+        :param sql_statements: выполненные SQL-запросы
+        :param url: адрес списка
+        :param expected: ожидаемое число запросов
+        """
+        client.get("/auth/token", headers=token_headers)
+        sql_statements.clear()
+        res = client.get(url, headers=token_headers)
+        assert res.status_code == 200
+        assert json.loads(res.data)
+        assert len(sql_statements) == expected, sql_statements
+
+    @pytest.mark.parametrize("url", [
+        "/tags?fields=author.nope",
+        "/tags?fields=author.notes",
+        "/tags/1?fields=author.nope",
+        "/notes?fields=author.nope",
+        "/notes?fields=tags.nope",
+        "/notes?fields=tags.author.notes",
+        "/notes?fields=id.nope",
+        "/notes/1?fields=tags.nope",
+    ])
+    def test_sparse_fields_unknown_nested(self, client, create_users_notes_tags, token_headers, url):
+        """
+        Тест неизвестных вложенных полей в параметре fields: ответ 400 с перечнем неизвестных полей
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        :param token_headers: аутентификация по токену
+        :param url: адрес
+        """
+        res = client.get(url, headers=token_headers)
+        assert res.status_code == 400
+        assert json.loads(res.data)["error"] == f"Invalid fields: {url.split('fields=')[1]}"
+
+    @pytest.mark.parametrize("url, expected, body", [
+        ("/notes/1?fields=id,note", 1, {"id": 1, "note": "user1 note 0"}),
+        ("/notes/1?fields=id,author.username", 1, {"id": 1, "author": {"username": "user1"}}),
+        ("/tags/1?fields=id,name", 1, {"id": 1, "name": "user1 tag 0"}),
+    ])
+    def test_item_sparse_fields(self, client, create_users_notes_tags, token_headers, sql_statements,
+                                url, expected, body):
+        """
+        Тест выборочных полей заметки и тега: незапрошенные связи не загружаются
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        :param token_headers: аутентификация по токену
+        :param sql_statements: выполненные SQL-запросы
+        :param url: адрес
+        :param expected: ожидаемое число запросов
+        :param body: ожидаемый ответ
+        """
+        client.get("/auth/token", headers=token_headers)
+        sql_statements.clear()
+        res = client.get(url, headers=token_headers)
+        assert res.status_code == 200
+        assert json.loads(res.data) == body
+        assert len(sql_statements) == expected, sql_statements
+
+    def test_sparse_fields_normalized(self, client, create_users_notes_tags, token_headers):
+        """
+        Тест разбора параметра fields: пробелы и пустые имена отбрасываются, пустое значение - все поля
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        :param token_headers: аутентификация по токену
+        """
+        full = json.loads(client.get("/notes", headers=token_headers).data)
+        assert json.loads(client.get("/notes?fields=", headers=token_headers).data) == full
+        res = client.get("/notes?fields=id,%20note,,", headers=token_headers)
+        assert json.loads(res.data) == [{"id": note["id"], "note": note["note"]} for note in full]
+
+    @pytest.mark.parametrize("url", ["/notes/public", "/notes/filter?tags=user1 tag 0&tags=user2 tag 1"])
+    def test_compact_format(self, client, create_users_notes_tags, url):
+        """
+        Тест компактного формата: те же данные, что и в полном формате, авторы и теги - по одному разу
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        :param url: адрес списка
+        """
+        full = json.loads(client.get(url).data)
+        separator = "&" if "?" in url else "?"
+        res = client.get(f"{url}{separator}format=compact")
+        assert res.status_code == 200
+        compact = json.loads(res.data)
+        assert sorted(compact["authors"]) == ["1", "2"]
+        assert len(compact["tags"]) == 4
+        restored = []
+        for note in compact["notes"]:
+            tags = [compact["tags"][str(tag_id)] for tag_id in note.pop("tag_ids")]
+            note["author"] = compact["authors"][str(note.pop("author_id"))]
+            note["tags"] = [{"id": tag["id"], "name": tag["name"], "author": compact["authors"][str(tag["author_id"])]}
+                            for tag in tags]
+            restored.append(note)
+        assert restored == full
+        assert len(res.data) < len(client.get(url).data)
+        assert client.get(f"{url}{separator}format=compact&fields=id").status_code == 422
+
+    def test_fast_serializer_equivalence(self, client, create_users_notes_tags):
+        """
+        Тест быстрой сериализации: те же словари, что и у схем marshmallow
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        """
+        NoteModel(author_id=1, note="no tags", date=datetime(2021, 1, 2, 3, 4, 5, 678901)).save()
+        notes = NoteModel.query.all()
+        assert serializers.dump_note(notes[-1])["tags"] == []
+        assert [serializers.dump_note(note) for note in notes] == NoteResponseSchema(many=True).dump(notes)
+        tags = TagModel.query.all()
+        assert [serializers.dump_tag(tag) for tag in tags] == TagResponseSchema(many=True).dump(tags)
+        users = [note.author for note in notes]
+        assert [serializers.dump_user(user) for user in users] == UserResponseSchema(many=True).dump(users)
+
+    @pytest.mark.parametrize("url, expected", [
+        ("/notes", 3),
+        ("/notes?stream=true", 3),
+        ("/notes/public", 3),
+        ("/notes/filter?tags=user1 tag 0&tags=user2 tag 1", 2),
+        ("/tags", 2),
+    ])
+    def test_fast_serializer_response(self, client, create_users_notes_tags, token_headers, sql_statements,
+                                      monkeypatch, url, expected):
+        """
+        Тест списков с быстрой сериализацией: тот же JSON и то же число запросов к БД
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        :param token_headers: заголовки с токеном пользователя
+        :param sql_statements: выполненные запросы SQL
+        :param url: адрес списка
+        :param expected: ожидаемое количество запросов
+        """
+        monkeypatch.setattr(Config, "FAST_SERIALIZER", False)
+        full = json.loads(client.get(url, headers=token_headers).data)
+        monkeypatch.setattr(Config, "FAST_SERIALIZER", True)
+        sql_statements.clear()
+        res = client.get(url, headers=token_headers)
+        assert res.status_code == 200
+        assert json.loads(res.data) == full
+        assert len(sql_statements) == expected, sql_statements
+        assert json.loads(client.get(url + ("&" if "?" in url else "?") + "fields=id", headers=token_headers).data) \
+            == [{"id": note["id"]} for note in full]
+
+    @pytest.mark.parametrize("url", ["/notes", "/notes?stream=true", "/notes/public", "/tags", "/notes/100"])
+    def test_json_encoder(self, client, create_users_notes_tags, token_headers, monkeypatch, url):
+        """
+        Тест кодировщиков JSON: orjson и json дают одинаковые ответы, включая ответы с ошибкой
+        :param client: клиент flask
+        :param create_users_notes_tags: создание пользователей, заметок и тегов
+        :param token_headers: заголовки с токеном пользователя
+        :param url: адрес
+        """
+        responses = []
+        for encoder in ("json", "orjson"):
+            monkeypatch.setattr(Config, "JSON_ENCODER", encoder)
+            res = client.get(url, headers=token_headers)
+            assert res.content_type == "application/json"
+            responses.append((res.status_code, json.loads(res.data)))
+        assert responses[0] == responses[1]
@@ -150,3 +150,23 @@ class TestTags:
         assert res.status_code == 404
         data = json.loads(res.data)
         assert data["error"] == "Tag with id=1 not found"
+
+    def test_get_tags_not_modified(self, client, create_test_tag1_and_tag2_by_user1, auth_headers, tag_data1):
+        """
+        Тест условного запроса тегов: 304 пока теги пользователя не изменились
+        :param client: клиент flask
+        :param create_test_tag1_and_tag2_by_user1: создание пользователя и тегов
+        :param auth_headers: аутентификация
+        :param tag_data1: параметры тега
+        """
+        res = client.get("/tags", headers=auth_headers)
+        assert res.status_code == 200
+        etag = res.headers["ETag"]
+        assert etag.startswith("W/")
+        res = client.get("/tags", headers={**auth_headers, "If-None-Match": etag})
+        assert res.status_code == 304
+        client.post("/tags", headers=auth_headers,
+                    data=json.dumps({"name": "new tag"}), content_type="application/json")
+        res = client.get("/tags", headers={**auth_headers, "If-None-Match": etag})
+        assert res.status_code == 200
+        assert len(json.loads(res.data)) == 3